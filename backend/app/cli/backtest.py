@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Backtest the BUY/SELL recommendation rules against local price history.
+
+Replays stored per-source sentiment (see SENTIMENT_HISTORY_PATH) through the
+engine's rules for a grid of source weights and confidence thresholds, and
+scores the resulting calls with forward returns from daily OHLC CSVs. The
+whole universe is evaluated as arrays, and weight settings are swept across
+a process pool.
+
+Run from the backend directory:
+
+    python -m app.cli.backtest sentiment_history.jsonl --prices prices/ --horizons 1 5 20
+
+Price files are {PRICES}/{SYMBOL}.csv with Date and Close (or Adj Close) columns.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.services import backtester
+from app.services.recommendation_rules import ACTION_CONFIDENCE_THRESHOLD
+
+# Cap on (settings x days) cells per task, keeping worker memory flat
+CELLS_PER_TASK = 2_000_000
+
+_shared: Dict[str, np.ndarray] = {}
+
+
+def _init_worker(scores: np.ndarray, present: np.ndarray, outcomes: np.ndarray, thresholds: np.ndarray):
+    # Inherited through fork, not pickled per task
+    _shared.update(scores=scores, present=present, outcomes=outcomes, thresholds=thresholds)
+
+
+def _run_chunk(weights: np.ndarray) -> Dict[str, np.ndarray]:
+    return backtester.run_chunk(
+        _shared["scores"], _shared["present"], _shared["outcomes"], weights, _shared["thresholds"]
+    )
+
+
+def parse_thresholds(values: Optional[List[str]]) -> np.ndarray:
+    """Explicit thresholds, or start:stop:step ranges (stop inclusive)"""
+    if not values:
+        return np.round(np.arange(0.0, 0.95 + 1e-9, 0.05), 4)
+    thresholds = []
+    for value in values:
+        if ":" in value:
+            start, stop, step = (float(part) for part in value.split(":"))
+            thresholds.extend(np.arange(start, stop + step / 2, step))
+        else:
+            thresholds.append(float(value))
+    return np.unique(np.round(thresholds, 4))
+
+
+def run(args) -> int:
+    started = time.perf_counter()
+    history = backtester.load_history(args.history, args.symbols)
+    if not len(history):
+        print(f"No sentiment history in {args.history}")
+        return 1
+
+    symbols = sorted(set(history.symbols))
+    prices = backtester.load_prices(args.prices, symbols, args.price_column)
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        print(f"No prices for {len(missing)} symbols: {', '.join(missing[:10])}{' ...' if len(missing) > 10 else ''}")
+    if not prices:
+        print(f"No price files for these symbols in {args.prices}")
+        return 1
+
+    horizons = sorted(set(args.horizons))
+    returns = backtester.forward_returns(history, prices, horizons)
+    # Always include the live threshold so the current rules get a row
+    thresholds = np.union1d(parse_thresholds(args.thresholds), [ACTION_CONFIDENCE_THRESHOLD])
+    weights = backtester.weight_grid(history.sources, args.weight_step)
+    scores = history.scores()
+    outcomes = backtester.trade_outcomes(returns)
+    print(
+        f"Loaded {len(history)} symbol-days ({len(symbols)} symbols, sources: {', '.join(history.sources)}) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    print(f"Sweeping {len(weights)} weightings x {len(thresholds)} thresholds x {len(horizons)} horizons on {args.workers} workers")
+
+    sweep_started = time.perf_counter()
+    per_task = max(1, CELLS_PER_TASK // len(history))
+    # Spread small grids over every worker
+    per_task = min(per_task, -(-len(weights) // args.workers))
+    chunks = [weights[i:i + per_task] for i in range(0, len(weights), per_task)]
+
+    if args.workers > 1 and len(chunks) > 1:
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        with context.Pool(args.workers, initializer=_init_worker,
+                          initargs=(scores, history.present, outcomes, thresholds)) as pool:
+            parts = pool.map(_run_chunk, chunks)
+    else:
+        parts = [backtester.run_chunk(scores, history.present, outcomes, chunk, thresholds) for chunk in chunks]
+
+    stats = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    results = backtester.summarize(stats, weights, thresholds, horizons, history.sources, args.min_trades)
+    print(f"Evaluated {len(weights) * len(thresholds) * len(horizons)} settings in {time.perf_counter() - sweep_started:.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(results)} results to {args.json}")
+
+    # Buy-and-hold over the same symbol-days, for comparison
+    baseline = np.nanmean(returns, axis=0)
+    for horizon, value in zip(horizons, baseline):
+        print(f"Baseline {horizon}d average return (always long): {value:+.4%}")
+
+    current = [
+        row for row in results
+        if row["current_weights"] and abs(row["threshold"] - ACTION_CONFIDENCE_THRESHOLD) < 1e-6
+    ]
+    print(f"\nCurrent rules (engine weights, threshold {ACTION_CONFIDENCE_THRESHOLD}):")
+    print_table(current)
+
+    ranked = sorted(
+        (row for row in results if row[args.sort] is not None),
+        key=lambda row: row[args.sort], reverse=True,
+    )
+    print(f"\nTop {args.top} by {args.sort}:")
+    print_table(ranked[:args.top])
+    return 0
+
+
+def print_table(rows: List[dict]):
+    if not rows:
+        print("  (no settings with enough trades)")
+        return
+    print(f"  {'weights':<40} {'thr':>5} {'h':>3} {'trades':>7} {'hit':>6} {'avg':>8} {'total':>9} {'sharpe':>7}")
+    for row in rows:
+        weights = " ".join(f"{source}={weight:g}" for source, weight in row["weights"].items())
+        sharpe = f"{row['sharpe']:.2f}" if row["sharpe"] is not None else "-"
+        print(
+            f"  {weights:<40} {row['threshold']:>5.2f} {row['horizon']:>3} {row['trades']:>7} "
+            f"{row['hit_rate']:>6.1%} {row['avg_return']:>+8.3%} {row['total_return']:>+9.2f} {sharpe:>7}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest sentiment recommendation rules against daily prices")
+    parser.add_argument("history", help="JSONL or CSV sentiment history (symbol, date, source, sentiment, confidence)")
+    parser.add_argument("--prices", required=True, help="Directory of {SYMBOL}.csv daily OHLC files")
+    parser.add_argument("--price-column", default="Adj Close", help="Price column (falls back to Close)")
+    parser.add_argument("--symbols", nargs="+", help="Only backtest these symbols")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 5, 20], help="Holding periods in trading days")
+    parser.add_argument("--thresholds", nargs="+",
+                        help="Confidence thresholds, values or start:stop:step (default 0:0.95:0.05)")
+    parser.add_argument("--weight-step", type=float, default=0.1, help="Resolution of the source weight grid")
+    parser.add_argument("--min-trades", type=int, default=30, help="Ignore settings with fewer trades")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Sweep processes")
+    parser.add_argument("--top", type=int, default=10, help="Settings to list")
+    parser.add_argument("--sort", default="sharpe", choices=["sharpe", "hit_rate", "avg_return", "total_return"])
+    parser.add_argument("--json", help="Write every evaluated setting to this file")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
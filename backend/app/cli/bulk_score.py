@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Resumable offline bulk scorer for archived headlines.
+
+Streams a JSONL or CSV corpus in chunks, scores the chunks across a process
+pool with batched inference, appends results to a JSONL file as they finish
+and checkpoints progress, so a killed job picks up where it stopped.
+
+Run from the backend directory:
+
+    python -m app.cli.bulk_score headlines.jsonl scores.jsonl --text-field title --workers 8
+
+Output lines look like {"id": ..., "sentiment": ..., "confidence": ..., "raw_scores": {...}}.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Record = Tuple[Any, str]  # (id, text)
+
+
+def iter_records(path: str, fmt: str, text_field: str, id_field: Optional[str]) -> Iterator[Record]:
+    """Stream (id, text) records without loading the file into memory"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        for number, row in enumerate(rows):
+            record_id = row.get(id_field) if id_field else number
+            yield record_id, row.get(text_field) or ""
+
+
+def iter_chunks(records: Iterator[Record], size: int) -> Iterator[List[Record]]:
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def load_checkpoint(path: str, input_path: str) -> Dict[str, Any]:
+    """Progress of a previous run over the same input, if any"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"Checkpoint {path} belongs to {checkpoint.get('input')}; use --restart to start over")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """Atomically replace the checkpoint file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _init_worker(threads: int):
+    from app.services.sentiment_analyzer import sentiment_analyzer
+
+    sentiment_analyzer.configure_threads(threads)
+    # Offline rescoring shouldn't flood the serving index or reuse its scores
+    sentiment_analyzer.embedding_index = None
+
+
+def _score_chunk(chunk: List[Record], batch_size: int) -> List[str]:
+    """Score one chunk in a worker process; returns serialized output lines"""
+    from app.services.sentiment_analyzer import sentiment_analyzer
+
+    results = sentiment_analyzer.score_batch([text for _, text in chunk], batch_size=batch_size)
+    return [
+        json.dumps({"id": record_id, **result.model_dump(mode="json")}) + "\n"
+        for (record_id, _), result in zip(chunk, results)
+    ]
+
+
+def run(args) -> int:
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+
+    checkpoint = {} if args.restart else load_checkpoint(checkpoint_path, args.input)
+    if checkpoint.get("completed"):
+        print(f"{args.input} already fully scored into {args.output} ({checkpoint['records_done']} records)")
+        return 0
+
+    records_done = checkpoint.get("records_done", 0)
+    output_bytes = checkpoint.get("output_bytes", 0)
+
+    if records_done and (not os.path.exists(args.output) or os.path.getsize(args.output) < output_bytes):
+        raise SystemExit(
+            f"Checkpoint {checkpoint_path} covers {records_done} records but {args.output} is missing or "
+            "truncated; restore it or use --restart to start over"
+        )
+
+    # Drop anything written after the last checkpoint so resumed output has no duplicates
+    mode = "r+" if records_done else "w"
+    out = open(args.output, mode, encoding="utf-8")
+    out.truncate(output_bytes if mode == "r+" else 0)
+    out.seek(0, os.SEEK_END)
+    if records_done:
+        print(f"Resuming after {records_done} records")
+
+    records = iter_records(args.input, fmt, args.text_field, args.id_field)
+    chunks = iter_chunks(islice(records, records_done, None), args.chunk_size)
+
+    # Load the model in this process before forking so workers share it
+    # copy-on-write (see gunicorn.conf.py for the same approach in serving).
+    # Keep this process single-threaded while loading: an intra-op thread
+    # pool started before fork is not usable in the workers
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    from app.services.sentiment_analyzer import sentiment_analyzer
+    print(f"Scoring with the {sentiment_analyzer.backend} backend on {args.workers} workers")
+
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    started = time.perf_counter()
+    scored = 0
+
+    with context.Pool(args.workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        # Bounded window of in-flight chunks keeps memory flat for any corpus size
+        in_flight = deque()
+        window = args.workers * 2
+
+        def drain_one():
+            nonlocal records_done, scored
+            lines = in_flight.popleft().get()
+            out.writelines(lines)
+            out.flush()
+            os.fsync(out.fileno())
+            records_done += len(lines)
+            scored += len(lines)
+            save_checkpoint(checkpoint_path, {
+                "input": os.path.abspath(args.input),
+                "records_done": records_done,
+                "output_bytes": out.tell(),
+            })
+            rate = scored / (time.perf_counter() - started)
+            print(f"\r{records_done} records scored ({rate:.0f}/s)", end="", file=sys.stderr, flush=True)
+
+        for chunk in chunks:
+            in_flight.append(pool.apply_async(_score_chunk, (chunk, args.batch_size)))
+            if len(in_flight) >= window:
+                drain_one()
+        while in_flight:
+            drain_one()
+
+    out.close()
+    save_checkpoint(checkpoint_path, {
+        "input": os.path.abspath(args.input),
+        "records_done": records_done,
+        "output_bytes": os.path.getsize(args.output),
+        "completed": True,
+    })
+    elapsed = time.perf_counter() - started
+    print(f"\nDone: {scored} records in {elapsed:.1f}s -> {args.output}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk sentiment scoring over JSONL/CSV corpora")
+    parser.add_argument("input", help="JSONL or CSV file of texts")
+    parser.add_argument("output", help="JSONL file to write scores to")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from extension)")
+    parser.add_argument("--text-field", default="text", help="Field/column holding the text")
+    parser.add_argument("--id-field", help="Field/column to copy as the record id (default: record number)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Records handed to a worker at a time")
+    parser.add_argument("--batch-size", type=int, default=32, help="Texts per transformer forward pass")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, FileResponse
 from dotenv import load_dotenv
 import os
+import re
+import time
 
-from app.routes import sentiment, analysis, data
+from app.routes import sentiment, analysis, data, stream
 from app.utils.database import connect_db, close_db
+from app.utils.metrics import HTTP_REQUEST_SECONDS, IN_FLIGHT_REQUESTS, render_metrics
+from app.utils.timing import start_request_timing, format_server_timing
+from app.utils.deadline import start_deadline, DEADLINE_HEADER, DEADLINE_PARAM
+from app.utils.profiling import request_profiler, PROFILE_HEADER
+from app.services.memory_manager import memory_manager
 
 load_dotenv()
 
@@ -35,21 +42,57 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "Server-Timing", "X-Profile-Id"],
 )
 
+# Request metrics, Server-Timing, deadlines and opt-in profiling
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    timings = start_request_timing()
+    start_deadline(request.headers.get(DEADLINE_HEADER) or request.query_params.get(DEADLINE_PARAM))
+    profiler = None
+    if request_profiler.wants_profile(request.headers.get(PROFILE_HEADER)):
+        profiler = request_profiler.start()
+
+    IN_FLIGHT_REQUESTS.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        elapsed = time.perf_counter() - start
+        response.headers["Server-Timing"] = format_server_timing(timings, elapsed)
+        response.headers["Timing-Allow-Origin"] = ", ".join(allowed_origins)
+        if profiler:
+            response.headers["X-Profile-Id"] = request_profiler.save(profiler, request.url.path)
+            profiler = None
+        return response
+    finally:
+        IN_FLIGHT_REQUESTS.dec()
+        if profiler:
+            profiler.stop()
+        # Label by route template so per-symbol paths don't explode cardinality
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method, route.path if route else "unmatched", str(status)
+        ).observe(time.perf_counter() - start)
+
 # Database events
 @app.on_event("startup")
 async def startup_event():
     await connect_db()
+    memory_manager.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    memory_manager.stop()
     await close_db()
 
 # Routes
 app.include_router(sentiment.router, prefix="/api/sentiment", tags=["sentiment"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["analysis"])
 app.include_router(data.router, prefix="/api/data", tags=["data"])
+app.include_router(stream.router, prefix="/api/stream", tags=["stream"])
 
 @app.get("/")
 async def root():
@@ -58,3 +101,26 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "finance-sentiment-api"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/debug/memory", include_in_schema=False)
+async def memory_status():
+    """Process memory against its budget, per-cache sizes and the active scorer"""
+    return memory_manager.status()
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str):
+    """Download a stored request profile (speedscope format)"""
+    if not request_profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not re.fullmatch(r"[\w-]+", profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile id")
+    path = request_profiler.profile_path(profile_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
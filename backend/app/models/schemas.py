@@ -24,6 +24,12 @@ class SentimentRequest(BaseModel):
     text: str = Field(..., min_length=1, description="Text to analyze")
 
 
+class RelatedArticlesRequest(BaseModel):
+    """Request model for related-article lookup"""
+    text: str = Field(..., min_length=1, description="Article text to find neighbours for")
+    k: int = Field(default=10, ge=1, le=100, description="Number of related articles")
+
+
 class SentimentResponse(BaseModel):
     """Response model for sentiment analysis"""
     sentiment: SentimentLabel
@@ -47,6 +53,9 @@ class AnalysisResult(BaseModel):
     risk_level: str
     key_insights: List[str]
     timestamp: datetime
+    # Set when the request deadline cut collection or inference short
+    partial: bool = False
+    skipped_sources: List[str] = []
 
 
 class InvestmentAdvice(BaseModel):
@@ -57,6 +66,9 @@ class InvestmentAdvice(BaseModel):
     reasoning: List[str]
     time_horizon: str
     risk_factors: List[str]
+    # Carried over from the underlying analysis when the deadline cut it short
+    partial: bool = False
+    skipped_sources: List[str] = []
 
 
 class NewsRequest(BaseModel):
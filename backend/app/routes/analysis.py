@@ -1,23 +1,38 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from app.models.schemas import AnalysisResult, InvestmentAdvice, NewsRequest
 from app.services.analysis_engine import analysis_engine
+from app.utils.http_cache import cache_headers
 
 router = APIRouter()
 
 @router.get("/symbol/{symbol}", response_model=AnalysisResult)
-async def analyze_symbol(symbol: str, days: int = 7):
+async def analyze_symbol(symbol: str, request: Request, response: Response, days: int = 7):
     """Comprehensive analysis for a financial symbol"""
     try:
-        result = await analysis_engine.analyze_symbol(symbol.upper(), days)
+        result, version = await analysis_engine.analyze_symbol_conditional(
+            symbol.upper(),
+            days,
+            if_none_match=request.headers.get("if-none-match"),
+            if_modified_since=request.headers.get("if-modified-since")
+        )
+        if result is None:
+            return Response(status_code=304, headers=cache_headers(version))
+        if result.partial:
+            # Cut short by the deadline: don't let clients revalidate into it
+            response.headers["Cache-Control"] = "no-store"
+        else:
+            response.headers.update(cache_headers(version))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @router.get("/advice/{symbol}", response_model=InvestmentAdvice)
-async def get_investment_advice(symbol: str):
+async def get_investment_advice(symbol: str, response: Response):
     """Get long-term investment advice"""
     try:
         advice = await analysis_engine.get_investment_advice(symbol.upper())
+        if advice.partial:
+            response.headers["Cache-Control"] = "no-store"
         return advice
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Advice generation failed: {str(e)}")
@@ -1,22 +1,59 @@
-from fastapi import APIRouter, HTTPException
+from typing import List
+from fastapi import APIRouter, HTTPException, Request, Response
 from app.services.data_collector import data_collector
+from app.services.quota_scheduler import quota_scheduler
+from app.utils.deadline import current_deadline
+from app.utils.http_cache import content_version, is_not_modified, cache_headers
 
 router = APIRouter()
 
+def _skipped_sources() -> List[str]:
+    """Sources the request deadline cut off while collecting"""
+    deadline = current_deadline()
+    return list(deadline.skipped) if deadline else []
+
+def _versioned(kind: str, symbol: str, items: list, skipped: List[str], request: Request, response: Response):
+    """Attach validators for a list of articles, or short-circuit with a 304"""
+    if skipped:
+        # Cut short by the deadline: no validators, so clients don't revalidate into it
+        response.headers["Cache-Control"] = "no-store"
+        return None
+    version = content_version(kind, symbol, sorted(
+        (item.get("title", ""), item.get("url", ""), item.get("content", ""), item.get("source", ""))
+        for item in items
+    ))
+    if is_not_modified(version, request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=cache_headers(version))
+    response.headers.update(cache_headers(version))
+    return None
+
 @router.get("/news/{symbol}")
-async def get_news_articles(symbol: str):
+async def get_news_articles(symbol: str, request: Request, response: Response):
     """Get news articles for a symbol"""
     try:
         articles = await data_collector.get_news_articles(symbol)
-        return {"symbol": symbol, "articles": articles}
+        skipped = _skipped_sources()
+        not_modified = _versioned("news", symbol, articles, skipped, request, response)
+        if not_modified:
+            return not_modified
+        return {"symbol": symbol, "articles": articles, "partial": bool(skipped), "skipped_sources": skipped}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch news: {str(e)}")
 
 @router.get("/blogs/{symbol}")
-async def get_blog_posts(symbol: str):
+async def get_blog_posts(symbol: str, request: Request, response: Response):
     """Get blog posts for a symbol"""
     try:
         posts = await data_collector.get_blog_posts(symbol)
-        return {"symbol": symbol, "posts": posts}
+        skipped = _skipped_sources()
+        not_modified = _versioned("blogs", symbol, posts, skipped, request, response)
+        if not_modified:
+            return not_modified
+        return {"symbol": symbol, "posts": posts, "partial": bool(skipped), "skipped_sources": skipped}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch blog posts: {str(e)}")
+
+@router.get("/quota")
+async def get_provider_quota():
+    """Remaining call budget for the keyed news APIs"""
+    return {"providers": quota_scheduler.status()}
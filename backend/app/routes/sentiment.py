@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import SentimentRequest, SentimentResponse, YouTubeTranscriptRequest
+import asyncio
+from typing import List
+from fastapi import APIRouter, Body, HTTPException
+from app.models.schemas import SentimentRequest, SentimentResponse, YouTubeTranscriptRequest, RelatedArticlesRequest
 from app.services.sentiment_analyzer import sentiment_analyzer
+from app.services.inference_scheduler import BULK
 from app.services.data_collector import data_collector
+from app.utils.timing import server_timing
 
 router = APIRouter()
 
@@ -9,7 +13,8 @@ router = APIRouter()
 async def analyze_sentiment(request: SentimentRequest):
     """Analyze sentiment of financial text"""
     try:
-        result = await sentiment_analyzer.analyze_sentiment(request.text)
+        with server_timing("inference"):
+            result = await sentiment_analyzer.analyze_sentiment(request.text)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
@@ -19,10 +24,11 @@ async def get_youtube_sentiment(request: YouTubeTranscriptRequest):
     """Get and analyze YouTube video transcript"""
     try:
         # Get transcript
-        transcript = await data_collector.get_youtube_transcript(
-            request.video_id, 
-            request.language
-        )
+        with server_timing("collection"):
+            transcript = await data_collector.get_youtube_transcript(
+                request.video_id, 
+                request.language
+            )
         
         if not transcript:
             raise HTTPException(
@@ -31,7 +37,8 @@ async def get_youtube_sentiment(request: YouTubeTranscriptRequest):
             )
         
         # Analyze sentiment
-        sentiment_result = await sentiment_analyzer.analyze_sentiment(transcript)
+        with server_timing("inference"):
+            sentiment_result = await sentiment_analyzer.analyze_sentiment(transcript)
         
         return {
             "video_id": request.video_id,
@@ -49,10 +56,39 @@ async def get_youtube_sentiment(request: YouTubeTranscriptRequest):
         )
 
 @router.post("/batch")
-async def analyze_batch_sentiment(texts: list):
-    """Analyze sentiment for multiple texts"""
+async def analyze_batch_sentiment(texts: List[str] = Body(...)):
+    """Analyze sentiment for multiple texts (JSON array body; runs in the bulk lane)"""
     try:
-        results = await sentiment_analyzer.analyze_batch(texts)
+        with server_timing("inference"):
+            results = await sentiment_analyzer.analyze_batch(texts, lane=BULK)
         return {"results": [result.dict() for result in results]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Batch analysis failed: {str(e)}")
+
+@router.post("/related")
+async def get_related_articles(request: RelatedArticlesRequest):
+    """Collected articles most similar to a text, by FinBERT embedding"""
+    if sentiment_analyzer.embedding_index is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Related articles need the transformer backend and EMBEDDING_INDEX_DIR"
+        )
+    try:
+        # A transformer-scored text is indexed, so the lookup reuses its embedding
+        with server_timing("inference"):
+            sentiment = await sentiment_analyzer.analyze_sentiment(request.text)
+        with server_timing("lookup"):
+            related = await asyncio.to_thread(sentiment_analyzer.related_articles, request.text, request.k)
+        return {"sentiment": sentiment.dict(), "related": related}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Related article lookup failed: {str(e)}")
+
+@router.get("/queue")
+async def get_inference_queue():
+    """Texts waiting for inference in each priority lane"""
+    return {"lanes": sentiment_analyzer.scheduler.queue_depths()}
+
+@router.get("/cascade/stats")
+async def get_cascade_stats():
+    """Cascade routing and agreement statistics for tuning CASCADE_MIN_MARGIN"""
+    return sentiment_analyzer.get_cascade_stats()
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.services.stream_hub import stream_hub, Subscriber
+
+router = APIRouter()
+
+MAX_SYMBOLS = int(os.getenv("STREAM_MAX_SYMBOLS", "50"))
+SEND_TIMEOUT = float(os.getenv("STREAM_SEND_TIMEOUT", "10"))
+
+async def _send_updates(websocket: WebSocket, subscriber: Subscriber):
+    """Forward pushed updates; a client that can't keep up within SEND_TIMEOUT is dropped"""
+    while True:
+        for message in await subscriber.next_messages():
+            await asyncio.wait_for(websocket.send_json(message), SEND_TIMEOUT)
+
+def _parse_request(message: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Decode a client frame into (request, None), or (None, error detail)"""
+    frame = message.get("text")
+    if frame is None:
+        frame = message.get("bytes") or b""
+    try:
+        request = json.loads(frame)
+    except ValueError:
+        return None, "Invalid JSON"
+    if not isinstance(request, dict):
+        return None, "Expected a JSON object"
+    symbols = request.get("symbols", [])
+    if not isinstance(symbols, list):
+        return None, "symbols must be a list"
+    return request, None
+
+@router.websocket("/ws")
+async def sentiment_stream(websocket: WebSocket):
+    """
+    Live per-symbol sentiment updates.
+
+    Send {"action": "subscribe" | "unsubscribe", "symbols": ["AAPL", ...]};
+    updates arrive as {"type": "snapshot" | "update", "symbol", "etag", "partial",
+    "skipped_sources", "analysis", "changes"}. A partial update (cut short by a
+    request deadline) is followed by the complete one on the next refresh.
+    """
+    await websocket.accept()
+    subscriber = Subscriber()
+    sender = asyncio.create_task(_send_updates(websocket, subscriber))
+    try:
+        while True:
+            receive = asyncio.create_task(websocket.receive())
+            done, _ = await asyncio.wait({receive, sender}, return_when=asyncio.FIRST_COMPLETED)
+            if sender in done:
+                receive.cancel()
+                sender.result()  # surfaces send errors / timeouts
+                break
+
+            message = receive.result()
+            if message["type"] == "websocket.disconnect":
+                break
+            request, error = _parse_request(message)
+            if error:
+                await websocket.send_json({"type": "error", "detail": error})
+                continue
+            action = request.get("action")
+            symbols = [str(symbol) for symbol in request.get("symbols", [])]
+
+            if action == "subscribe":
+                room = MAX_SYMBOLS - len(subscriber.symbols)
+                added = stream_hub.subscribe(subscriber, symbols[:max(room, 0)])
+                await websocket.send_json({"type": "subscribed", "symbols": sorted(subscriber.symbols), "added": added})
+            elif action == "unsubscribe":
+                removed = stream_hub.unsubscribe(subscriber, symbols)
+                await websocket.send_json({"type": "unsubscribed", "symbols": sorted(subscriber.symbols), "removed": removed})
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown action: {action}"})
+    except (WebSocketDisconnect, asyncio.TimeoutError):
+        pass
+    except Exception as e:
+        print(f"Stream connection error: {e}")
+    finally:
+        sender.cancel()
+        stream_hub.unsubscribe(subscriber)
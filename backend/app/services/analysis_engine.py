@@ -1,36 +1,84 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import asyncio
+import json
+import os
 from datetime import datetime, timedelta
 from app.models.schemas import SentimentLabel, AnalysisResult, InvestmentAdvice, SourceType
 from app.services.sentiment_analyzer import sentiment_analyzer
+from app.services.inference_scheduler import ANALYSIS
+from app.services.recommendation_rules import SOURCE_WEIGHTS, DEFAULT_SOURCE_WEIGHT, ACTION_CONFIDENCE_THRESHOLD
 from app.services.data_collector import data_collector
+from app.services.text_normalizer import text_normalizer
+from app.utils.metrics import ANALYSIS_STAGE_SECONDS
+from app.utils.timing import server_timing
+from app.utils.deadline import current_deadline
+from app.utils.cache import TTLCache
+from app.utils.http_cache import ContentVersion, content_version, is_not_modified
 import numpy as np
 
 class AnalysisEngine:
     def __init__(self):
-        self.sentiment_weights = {
-            SourceType.NEWS: 0.4,
-            SourceType.YOUTUBE: 0.3,
-            SourceType.BLOG: 0.2,
-            SourceType.SOCIAL: 0.1
-        }
+        self.sentiment_weights = dict(SOURCE_WEIGHTS)
+        self.default_source_weight = DEFAULT_SOURCE_WEIGHT
+        self.confidence_threshold = ACTION_CONFIDENCE_THRESHOLD
+        # Per-source daily sentiment for app.cli.backtest (JSONL, appended)
+        self.history_path = os.getenv("SENTIMENT_HISTORY_PATH")
+        # Finished analyses keyed by content version (ETag)
+        self.snapshots = TTLCache(
+            "analysis_snapshots",
+            ttl=float(os.getenv("ANALYSIS_SNAPSHOT_TTL", "3600")),
+            maxsize=256,
+            priority=2  # costly to rebuild: evicted last under memory pressure
+        )
+        self._result_listeners: List[Callable[[str, int, AnalysisResult, ContentVersion], None]] = []
 
     async def analyze_symbol(self, symbol: str, days: int = 7) -> AnalysisResult:
         """Comprehensive analysis for a symbol"""
+        result, _ = await self.analyze_symbol_conditional(symbol, days)
+        return result
+
+    async def analyze_symbol_conditional(
+        self,
+        symbol: str,
+        days: int = 7,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[str] = None
+    ) -> Tuple[Optional[AnalysisResult], ContentVersion]:
+        """
+        Analyze a symbol, skipping inference when nothing changed.
+
+        Returns (None, version) when the client's validators still match the
+        collected article set, otherwise the (possibly cached) result.
+        """
         
         # Collect data from various sources
-        data_sources = await self._collect_data(symbol, days)
+        with ANALYSIS_STAGE_SECONDS.labels("collection").time(), server_timing("collection"):
+            data_sources = await self._collect_data(symbol, days)
         
-        # Analyze sentiment for each source
-        sentiment_results = await self._analyze_sentiments(data_sources)
-        
-        # Calculate overall sentiment
-        overall_sentiment = self._calculate_overall_sentiment(sentiment_results)
+        version = self._content_version(symbol, days, data_sources)
+        if is_not_modified(version, if_none_match, if_modified_since):
+            return None, version
         
-        # Generate insights and recommendation
-        insights = self._generate_insights(sentiment_results, symbol)
-        recommendation = self._generate_recommendation(overall_sentiment, insights)
+        cached = self.snapshots.get(version.etag)
+        if cached is not None:
+            self._notify(symbol, days, cached, version)
+            return cached, version
         
-        return AnalysisResult(
+        # Analyze sentiment for each source
+        with ANALYSIS_STAGE_SECONDS.labels("inference").time(), server_timing("inference"):
+            sentiment_results = await self._analyze_sentiments(data_sources)
+        
+        with ANALYSIS_STAGE_SECONDS.labels("aggregation").time(), server_timing("aggregation"):
+            # Calculate overall sentiment
+            overall_sentiment = self._calculate_overall_sentiment(sentiment_results)
+            
+            # Generate insights and recommendation
+            insights = self._generate_insights(sentiment_results, symbol)
+            recommendation = self._generate_recommendation(overall_sentiment, insights)
+        
+        deadline = current_deadline()
+        skipped_sources = list(deadline.skipped) if deadline else []
+        result = AnalysisResult(
             symbol=symbol,
             overall_sentiment=overall_sentiment["sentiment"],
             confidence_score=overall_sentiment["confidence"],
@@ -41,8 +89,56 @@ class AnalysisEngine:
             recommendation=recommendation["action"],
             risk_level=recommendation["risk"],
             key_insights=insights,
-            timestamp=datetime.now()
+            timestamp=datetime.now(),
+            partial=bool(skipped_sources),
+            skipped_sources=skipped_sources
         )
+        if not result.partial:
+            # A cut-short result must not be served later as the full one,
+            # nor recorded as that day's sentiment for backtests
+            self.snapshots.set(version.etag, result)
+            if self.history_path:
+                await asyncio.to_thread(self._record_history, symbol, sentiment_results, data_sources)
+        self._notify(symbol, days, result, version)
+        return result, version
+
+    def add_result_listener(self, listener: Callable[[str, int, AnalysisResult, ContentVersion], None]):
+        """Call `listener(symbol, days, result, version)` whenever an analysis is served"""
+        self._result_listeners.append(listener)
+
+    def _notify(self, symbol: str, days: int, result: AnalysisResult, version: ContentVersion):
+        for listener in self._result_listeners:
+            try:
+                listener(symbol, days, result, version)
+            except Exception as e:
+                print(f"Analysis listener failed: {e}")
+
+    def _content_version(self, symbol: str, days: int, data_sources: Dict[SourceType, List[str]]) -> ContentVersion:
+        """Version of an analysis: the article set plus the scorer that will score it"""
+        texts = {source.value: sorted(texts) for source, texts in data_sources.items()}
+        return content_version("analysis", symbol, days, sentiment_analyzer.backend, texts)
+
+    def _record_history(self, symbol: str, sentiment_results: Dict[SourceType, Any], data_sources: Dict[SourceType, List[str]]):
+        """Append this analysis' per-source sentiment to the history file (blocking)"""
+        now = datetime.now()
+        lines = [
+            json.dumps({
+                "symbol": symbol,
+                "date": now.date().isoformat(),
+                "timestamp": now.isoformat(timespec="seconds"),
+                "source": source.value,
+                "sentiment": result.sentiment.value,
+                "confidence": round(float(result.confidence), 4),
+                "texts": len(data_sources.get(source, [])),
+            }) + "\n"
+            for source, result in sentiment_results.items()
+        ]
+        try:
+            # One write per analysis, so concurrent appends don't interleave lines
+            with open(self.history_path, "a") as f:
+                f.write("".join(lines))
+        except OSError as e:
+            print(f"Could not record sentiment history: {e}")
 
     async def get_investment_advice(self, symbol: str) -> InvestmentAdvice:
         """Generate long-term investment advice"""
@@ -69,20 +165,34 @@ class AnalysisEngine:
             confidence=analysis.confidence_score,
             reasoning=reasoning + analysis.key_insights,
             time_horizon="3-6 months",
-            risk_factors=risk_factors
+            risk_factors=risk_factors,
+            partial=analysis.partial,
+            skipped_sources=analysis.skipped_sources
         )
 
     async def _collect_data(self, symbol: str, days: int) -> Dict[SourceType, List[str]]:
         """Collect data from various sources"""
         data = {}
         
-        # Get news articles
-        news_articles = await data_collector.get_news_articles(symbol)
-        data[SourceType.NEWS] = [article["content"] for article in news_articles]
+        # Get news articles and blog posts concurrently (each stops at the request deadline)
+        news_articles, blog_posts = await asyncio.gather(
+            data_collector.get_news_articles(symbol),
+            data_collector.get_blog_posts(symbol)
+        )
         
-        # Get blog posts
-        blog_posts = await data_collector.get_blog_posts(symbol)
-        data[SourceType.BLOG] = [post["content"] for post in blog_posts]
+        # Strip markup and boilerplate so inference only spends tokens on the text
+        with ANALYSIS_STAGE_SECONDS.labels("normalization").time(), server_timing("normalization"):
+            data[SourceType.NEWS] = text_normalizer.normalize_batch(news_articles)
+            data[SourceType.BLOG] = text_normalizer.normalize_batch(blog_posts)
+        
+        index = sentiment_analyzer.embedding_index
+        if index is not None:
+            # Lets related-article lookups return titles and links, not just text
+            # (SQLite writes, so off the event loop)
+            for source, articles in ((SourceType.NEWS, news_articles), (SourceType.BLOG, blog_posts)):
+                await asyncio.to_thread(
+                    index.annotate, symbol, [sentiment_analyzer.index_text(text) for text in data[source]], articles
+                )
         
         return data
 
@@ -90,11 +200,17 @@ class AnalysisEngine:
         """Analyze sentiment for each data source"""
         results = {}
         
-        for source_type, texts in data_sources.items():
-            if texts:
-                # Analyze all texts for this source
-                sentiment_results = await sentiment_analyzer.analyze_batch(texts)
-                
+        # Score every source at once; texts still queued at the deadline are dropped
+        sources = [(source_type, texts) for source_type, texts in data_sources.items() if texts]
+        batches = await asyncio.gather(*[
+            sentiment_analyzer.analyze_batch(texts, allow_partial=True, lane=ANALYSIS) for _, texts in sources
+        ])
+        
+        deadline = current_deadline()
+        for (source_type, texts), sentiment_results in zip(sources, batches):
+            if len(sentiment_results) < len(texts) and deadline:
+                deadline.skip(f"inference:{source_type.value}")
+            if sentiment_results:
                 # Average the results
                 avg_confidence = np.mean([r.confidence for r in sentiment_results])
                 dominant_sentiment = max(
@@ -118,7 +234,7 @@ class AnalysisEngine:
         sentiment_scores = {label: 0 for label in SentimentLabel}
         
         for source_type, result in sentiment_results.items():
-            weight = self.sentiment_weights.get(source_type, 0.1)
+            weight = self.sentiment_weights.get(source_type, self.default_source_weight)
             sentiment_scores[result.sentiment] += weight * result.confidence
             total_weight += weight
         
@@ -162,13 +278,13 @@ class AnalysisEngine:
         confidence = overall_sentiment["confidence"]
         
         if sentiment == SentimentLabel.POSITIVE:
-            if confidence > 0.7:
+            if confidence > self.confidence_threshold:
                 return {"action": "Consider buying", "risk": "Low"}
             else:
                 return {"action": "Monitor for buying opportunity", "risk": "Medium"}
         
         elif sentiment == SentimentLabel.NEGATIVE:
-            if confidence > 0.7:
+            if confidence > self.confidence_threshold:
                 return {"action": "Consider selling", "risk": "High"}
             else:
                 return {"action": "Reduce position", "risk": "Medium"}
@@ -189,6 +305,9 @@ class AnalysisEngine:
         if len(analysis.source_breakdown) < 2:
             risk_factors.append("Limited data sources available")
         
+        if analysis.partial:
+            risk_factors.append(f"Incomplete analysis: {', '.join(analysis.skipped_sources) or 'some sources'} timed out")
+        
         return risk_factors
 
 analysis_engine = AnalysisEngine()
@@ -0,0 +1,276 @@
+import csv
+import json
+import os
+from itertools import product
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.schemas import SentimentLabel
+from app.services.recommendation_rules import SOURCE_WEIGHTS, DEFAULT_SOURCE_WEIGHT
+
+# Label axis order; matches AnalysisEngine, where ties go to the first label
+LABELS = list(SentimentLabel)
+POSITIVE = LABELS.index(SentimentLabel.POSITIVE)
+NEGATIVE = LABELS.index(SentimentLabel.NEGATIVE)
+NEUTRAL = LABELS.index(SentimentLabel.NEUTRAL)
+
+TRADING_DAYS = 252
+
+
+class SentimentHistory:
+    """
+    Per-source sentiment for every (symbol, date) as dense arrays.
+
+    `labels` and `confidence` are (days, sources); `present` marks which
+    sources had data that day, since the engine only weighs sources it saw.
+    """
+
+    def __init__(self, symbols: np.ndarray, dates: np.ndarray, sources: List[str],
+                 labels: np.ndarray, confidence: np.ndarray, present: np.ndarray):
+        self.symbols = symbols
+        self.dates = dates
+        self.sources = sources
+        self.labels = labels
+        self.confidence = confidence
+        self.present = present
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def scores(self) -> np.ndarray:
+        """(days, sources, labels) confidence placed in each source's label slot"""
+        onehot = np.zeros(self.labels.shape + (len(LABELS),), dtype=np.float32)
+        np.put_along_axis(onehot, self.labels[..., None], 1.0, axis=-1)
+        return onehot * (self.confidence * self.present)[..., None]
+
+
+def _read_rows(path: str) -> List[Dict[str, Any]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_history(path: str, symbols: Optional[Sequence[str]] = None) -> SentimentHistory:
+    """
+    Load sentiment history as written by the engine (SENTIMENT_HISTORY_PATH).
+
+    JSONL or CSV rows with symbol, date, source, sentiment and confidence;
+    when a source was analysed several times on one day the last row counts.
+    """
+    wanted = {s.upper() for s in symbols} if symbols else None
+    latest: Dict[Tuple[str, str, str], Tuple[int, float]] = {}
+    for row in _read_rows(path):
+        symbol = str(row["symbol"]).upper()
+        if wanted and symbol not in wanted:
+            continue
+        label = LABELS.index(SentimentLabel(row["sentiment"]))
+        latest[(symbol, str(row["date"])[:10], row["source"])] = (label, float(row["confidence"]))
+
+    sources = sorted({source for _, _, source in latest})
+    days = sorted({(symbol, date) for symbol, date, _ in latest})
+    day_index = {day: i for i, day in enumerate(days)}
+    source_index = {source: i for i, source in enumerate(sources)}
+
+    labels = np.full((len(days), len(sources)), NEUTRAL, dtype=np.int64)
+    confidence = np.zeros((len(days), len(sources)), dtype=np.float32)
+    present = np.zeros((len(days), len(sources)), dtype=np.float32)
+    for (symbol, date, source), (label, conf) in latest.items():
+        i, j = day_index[(symbol, date)], source_index[source]
+        labels[i, j] = label
+        confidence[i, j] = conf
+        present[i, j] = 1.0
+
+    return SentimentHistory(
+        symbols=np.array([symbol for symbol, _ in days], dtype=object),
+        dates=np.array([date for _, date in days], dtype="datetime64[D]"),
+        sources=sources,
+        labels=labels,
+        confidence=confidence,
+        present=present,
+    )
+
+
+def load_prices(directory: str, symbols: Sequence[str], column: str = "Adj Close") -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Daily closes from {directory}/{SYMBOL}.csv (Yahoo-style OHLC export).
+
+    Uses `column` when the file has it, otherwise Close. Returns
+    {symbol: (dates, closes)} sorted by date; symbols without a file are left out.
+    """
+    prices = {}
+    for symbol in symbols:
+        path = os.path.join(directory, f"{symbol}.csv")
+        if not os.path.exists(path):
+            continue
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        if not rows:
+            continue
+        field = column if column in rows[0] else "Close"
+        rows = [row for row in rows if row.get(field) not in (None, "", "null")]
+        dates = np.array([row["Date"][:10] for row in rows], dtype="datetime64[D]")
+        closes = np.array([float(row[field]) for row in rows], dtype=np.float64)
+        order = np.argsort(dates, kind="stable")
+        prices[symbol] = (dates[order], closes[order])
+    return prices
+
+
+def forward_returns(history: SentimentHistory, prices: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                    horizons: Sequence[int]) -> np.ndarray:
+    """
+    (days, horizons) simple returns of acting on each day's sentiment.
+
+    Entry is the close of the first trading day after the sentiment date (the
+    analysis may run after that day's close), exit `h` trading days later.
+    NaN where the price history doesn't cover the trade.
+    """
+    horizons = np.asarray(horizons, dtype=np.int64)
+    returns = np.full((len(history), len(horizons)), np.nan)
+    for symbol in np.unique(history.symbols):
+        if symbol not in prices:
+            continue
+        dates, closes = prices[symbol]
+        rows = np.flatnonzero(history.symbols == symbol)
+        entry = np.searchsorted(dates, history.dates[rows], side="right")
+        exit_ = entry[:, None] + horizons[None, :]
+        valid = exit_ < len(closes)
+        entry_price = closes[np.minimum(entry, len(closes) - 1)][:, None]
+        exit_price = closes[np.minimum(exit_, len(closes) - 1)]
+        returns[rows] = np.where(valid, exit_price / entry_price - 1, np.nan)
+    return returns
+
+
+def weight_grid(sources: Sequence[str], step: float) -> np.ndarray:
+    """
+    Source weight combinations to sweep: every point of the simplex at `step`
+    resolution, preceded by the engine's current weights (row 0).
+    """
+    current = [SOURCE_WEIGHTS.get(source, DEFAULT_SOURCE_WEIGHT) for source in sources]
+    units = int(round(1 / step))
+    points = [
+        combo for combo in product(range(units + 1), repeat=len(sources) - 1)
+        if sum(combo) <= units
+    ]
+    grid = np.array([[*combo, units - sum(combo)] for combo in points], dtype=np.float32) / units
+    return np.vstack([np.array(current, dtype=np.float32), grid])
+
+
+def overall_sentiment(scores: np.ndarray, present: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    AnalysisEngine._calculate_overall_sentiment for many weightings at once.
+
+    scores (days, sources, labels), present (days, sources), weights
+    (settings, sources) -> dominant label and its confidence, each (settings, days).
+    """
+    # (labels, days, sources) @ (sources, settings) -> (labels, days, settings)
+    weighted = np.matmul(scores.transpose(2, 0, 1), weights.T).transpose(2, 1, 0)
+    total = weights @ present.T
+    weighted /= np.where(total > 0, total, 1.0)[..., None]
+    labels = weighted.argmax(axis=-1)
+    confidence = np.take_along_axis(weighted, labels[..., None], axis=-1)[..., 0]
+    # No source at all: the engine reports neutral at 0.5
+    empty = ~present.any(axis=1)
+    labels[:, empty] = NEUTRAL
+    confidence[:, empty] = 0.5
+    return labels, confidence
+
+
+OUTCOMES = ["trades", "longs", "return", "return_sq", "hits"]
+
+
+def trade_outcomes(returns: np.ndarray) -> np.ndarray:
+    """
+    Per-day contributions of a call, shaped (OUTCOMES, horizons, days, side)
+    where side 0 is a buy and 1 a sell. Days without a full price window add
+    nothing.
+    """
+    valid = ~np.isnan(returns.T)
+    filled = np.where(valid, returns.T, 0.0)
+    outcomes = np.stack([
+        np.stack([valid, valid], axis=-1),
+        np.stack([valid, np.zeros_like(valid)], axis=-1),
+        np.stack([filled, -filled], axis=-1),
+        np.stack([filled * filled, filled * filled], axis=-1),
+        np.stack([filled > 0, filled < 0], axis=-1),
+    ])
+    return np.ascontiguousarray(outcomes, dtype=np.float64)
+
+
+def sweep_thresholds(labels: np.ndarray, confidence: np.ndarray, outcomes: np.ndarray,
+                     thresholds: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    _generate_recommendation's calls scored for every threshold in one pass.
+
+    A day is a buy (sell) when the overall sentiment is positive (negative)
+    with confidence above the threshold; threshold 0 gives the looser
+    get_investment_advice rule. Rather than build positions per threshold,
+    each call is bucketed by how many thresholds it clears, outcomes are
+    summed per (setting, bucket), and a reverse cumulative sum over buckets
+    gives the totals at every threshold.
+
+    Returns statistics shaped (settings, thresholds, horizons).
+    """
+    settings = labels.shape[0]
+    buckets = len(thresholds) + 1
+    side = np.where(labels == POSITIVE, 0, np.where(labels == NEGATIVE, 1, -1))
+    # Number of thresholds strictly below the confidence, i.e. cleared by this call
+    cleared = np.searchsorted(thresholds, confidence, side="left")
+
+    setting, day = np.nonzero(side >= 0)
+    group = setting * buckets + cleared[setting, day]
+    cell = day * 2 + side[setting, day]
+    per_day = outcomes.reshape(len(OUTCOMES) * outcomes.shape[1], -1)
+    totals = np.stack([
+        np.bincount(group, weights=column[cell], minlength=settings * buckets)
+        for column in per_day
+    ]).reshape(len(OUTCOMES), outcomes.shape[1], settings, buckets)
+    # A call clearing k thresholds counts at each of thresholds[0..k-1]
+    totals = totals[..., ::-1].cumsum(axis=-1)[..., ::-1][..., 1:]
+    trades, longs, pnl, pnl_sq, hits = totals.transpose(0, 2, 3, 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = pnl / trades
+        std = np.sqrt(np.maximum(pnl_sq / trades - mean * mean, 0.0))
+        return {
+            "trades": trades,
+            "longs": longs,
+            "shorts": trades - longs,
+            "hit_rate": hits / trades,
+            "avg_return": mean,
+            "total_return": pnl,
+            "std_return": std,
+            "sharpe": mean / std,
+        }
+
+
+def run_chunk(scores: np.ndarray, present: np.ndarray, outcomes: np.ndarray,
+              weights: np.ndarray, thresholds: np.ndarray) -> Dict[str, np.ndarray]:
+    """Statistics shaped (settings, thresholds, horizons) for a block of weightings"""
+    labels, confidence = overall_sentiment(scores, present, weights)
+    return sweep_thresholds(labels, confidence, outcomes, thresholds)
+
+
+def summarize(stats: Dict[str, np.ndarray], weights: np.ndarray, thresholds: np.ndarray,
+              horizons: Sequence[int], sources: Sequence[str], min_trades: int = 1) -> List[Dict[str, Any]]:
+    """Flatten swept statistics into one row per (weights, threshold, horizon)"""
+    results = []
+    for w, t, h in zip(*np.nonzero(stats["trades"] >= min_trades)):
+        horizon = int(horizons[h])
+        sharpe = stats["sharpe"][w, t, h]
+        results.append({
+            "weights": {source: round(float(weight), 4) for source, weight in zip(sources, weights[w])},
+            "current_weights": bool(w == 0),
+            "threshold": round(float(thresholds[t]), 4),
+            "horizon": horizon,
+            "trades": int(stats["trades"][w, t, h]),
+            "longs": int(stats["longs"][w, t, h]),
+            "shorts": int(stats["shorts"][w, t, h]),
+            "hit_rate": round(float(stats["hit_rate"][w, t, h]), 4),
+            "avg_return": round(float(stats["avg_return"][w, t, h]), 6),
+            "total_return": round(float(stats["total_return"][w, t, h]), 4),
+            # Trades overlap when the horizon exceeds a day, so treat this as a ranking aid
+            "sharpe": round(float(sharpe * np.sqrt(TRADING_DAYS / horizon)), 3) if np.isfinite(sharpe) else None,
+        })
+    return results
@@ -6,21 +6,134 @@ from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFoun
 import feedparser
 from bs4 import BeautifulSoup
 import json
+import time
 from datetime import datetime, timedelta
+from urllib.parse import urlparse, quote
 from app.models.schemas import SourceType
+from app.utils.cache import TTLCache
+from app.utils.fixtures import load_fixture, save_fixture
+from app.services.symbol_matcher import symbol_matcher
+from app.services.quota_scheduler import quota_scheduler
+from app.utils.deadline import current_deadline, gather_until_deadline
+from app.utils.metrics import PROVIDER_FETCH_SECONDS, FEED_PARSE_SECONDS, MOCK_FALLBACK_TOTAL
 import os
 
+# Short provider names for known upstream hosts (used for fixtures and stub routing)
+FEED_PROVIDERS = {
+    "feeds.finance.yahoo.com": "yahoo",
+    "news.google.com": "google_news",
+    "finnhub.io": "finnhub",
+    "newsapi.org": "newsapi",
+    "www.investing.com": "investing",
+    "www.marketwatch.com": "marketwatch",
+    "seekingalpha.com": "seekingalpha",
+}
+
+# Market-wide feeds scanned for symbol mentions
+GENERIC_RSS_FEEDS = [
+    "https://www.investing.com/rss/news.rss",
+    "https://www.marketwatch.com/rss/topstories",
+    "https://seekingalpha.com/market_currents.xml",
+]
+
 class DataCollector:
     def __init__(self):
         self.session = None
         self.news_api_key = os.getenv("NEWS_API_KEY")  # Optional: Get from environment
         self.finnhub_api_key = os.getenv("FINNHUB_API_KEY")  # Optional: Get from environment
+        # Offline/load-test support: replay recorded payloads, record live ones,
+        # or send every upstream call to a local stub server
+        self.replay_dir = os.getenv("DATA_REPLAY_DIR")
+        self.record_dir = os.getenv("DATA_RECORD_DIR")
+        self.upstream_override_url = os.getenv("UPSTREAM_OVERRIDE_URL", "").rstrip("/") or None
+        self.upstream_timeout = float(os.getenv("UPSTREAM_TIMEOUT", "15"))
+        # Raw feed/API payloads are reused for a short while so polling doesn't refetch
+        self.feed_cache = TTLCache("feeds", ttl=float(os.getenv("FEED_CACHE_TTL", "60")), maxsize=512, priority=0)
+        # Last good payload from quota-limited APIs, served when the budget runs out;
+        # can't be refetched once the quota is gone, so memory pressure leaves it alone
+        self.stale_payloads = TTLCache("stale_payloads", ttl=24 * 3600, maxsize=512, priority=2, shrinkable=False)
 
     async def get_session(self):
         if self.session is None:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.upstream_timeout)
+            )
         return self.session
 
+    @staticmethod
+    def provider_for(url: str) -> str:
+        """Short provider name for an upstream URL"""
+        host = urlparse(url).netloc
+        return FEED_PROVIDERS.get(host, host)
+
+    async def _fetch_text(self, url: str, key: str, ext: str = "xml", api_key: Optional[str] = None) -> Optional[str]:
+        """Fetch a raw upstream payload, served from the feed cache while fresh"""
+        cached = self.feed_cache.get(url)
+        if cached is not None:
+            return cached
+
+        provider = self.provider_for(url)
+        if api_key and not self.replay_dir and quota_scheduler.has_quota(provider):
+            if not await quota_scheduler.acquire(provider, api_key, key):
+                # Out of budget for now: serve the last payload we had rather than nothing
+                print(f"{provider} quota exhausted, serving last known data for {key}")
+                return self.stale_payloads.get(url)
+
+        text = await self._fetch_upstream(url, key, ext, api_key)
+        if text is not None:
+            self.feed_cache.set(url, text)
+            if api_key:
+                self.stale_payloads.set(url, text)
+        elif api_key:
+            return self.stale_payloads.get(url)
+        return text
+
+    async def _fetch_upstream(self, url: str, key: str, ext: str, api_key: Optional[str] = None) -> Optional[str]:
+        """Fetch a raw upstream payload, honouring replay, record and override settings"""
+        provider = self.provider_for(url)
+
+        start = time.perf_counter()
+        outcome = "exception"
+        try:
+            if self.replay_dir:
+                text = load_fixture(self.replay_dir, provider, key, ext)
+                outcome = "replay"
+                return text
+
+            if self.upstream_override_url:
+                url = f"{self.upstream_override_url}/{provider}/{quote(key)}"
+
+            session = await self.get_session()
+            async with session.get(url) as response:
+                if response.status == 429 and api_key:
+                    retry_after = response.headers.get("Retry-After")
+                    quota_scheduler.report_throttled(
+                        provider, api_key, float(retry_after) if retry_after and retry_after.isdigit() else None
+                    )
+                if response.status != 200:
+                    outcome = f"http_{response.status}"
+                    print(f"{provider} returned HTTP {response.status}")
+                    return None
+                text = await response.text()
+            outcome = "ok"
+
+            if self.record_dir:
+                save_fixture(self.record_dir, provider, key, ext, text)
+            return text
+        finally:
+            PROVIDER_FETCH_SECONDS.labels(provider, outcome).observe(time.perf_counter() - start)
+
+    async def _fetch_feed(self, url: str, key: str):
+        """Fetch and parse an RSS/Atom feed"""
+        text = await self._fetch_text(url, key, "xml")
+        with FEED_PARSE_SECONDS.labels(self.provider_for(url)).time():
+            return feedparser.parse(text or "")
+
+    async def _fetch_json(self, url: str, key: str, api_key: Optional[str] = None) -> Any:
+        """Fetch and decode a JSON API payload (quota-scheduled when api_key is given)"""
+        text = await self._fetch_text(url, key, "json", api_key)
+        return json.loads(text) if text else None
+
     async def close_session(self):
         if self.session:
             await self.session.close()
@@ -81,34 +194,35 @@ class DataCollector:
         """Get financial news articles from multiple sources"""
         session = await self.get_session()
         all_articles = []
+        quota_scheduler.record_demand(symbol)
         
-        # Try multiple sources
+        # Query every source at once; whatever hasn't answered by the request
+        # deadline is dropped (and reported) rather than waited on
         try:
-            # 1. Yahoo Finance RSS Feed
-            yahoo_articles = await self._get_yahoo_finance_news(symbol)
-            all_articles.extend(yahoo_articles)
-            
-            # 2. Google Finance News
-            google_articles = await self._get_google_finance_news(symbol)
-            all_articles.extend(google_articles)
-            
-            # 3. Finnhub (if API key available)
+            providers = {
+                "yahoo": self._get_yahoo_finance_news(symbol),
+                "google_news": self._get_google_finance_news(symbol),
+            }
+            # Finnhub and NewsAPI need API keys
             if self.finnhub_api_key:
-                finnhub_articles = await self._get_finnhub_news(symbol)
-                all_articles.extend(finnhub_articles)
-            
-            # 4. NewsAPI (if API key available)
+                providers["finnhub"] = self._get_finnhub_news(symbol)
             if self.news_api_key or api_key:
-                newsapi_articles = await self._get_newsapi_articles(symbol, api_key or self.news_api_key)
-                all_articles.extend(newsapi_articles)
+                providers["newsapi"] = self._get_newsapi_articles(symbol, api_key or self.news_api_key)
             
-            # If no articles from APIs, use mock data
-            if not all_articles:
+            results, skipped = await gather_until_deadline(providers)
+            self._report_skipped("news", skipped)
+            for name in providers:
+                all_articles.extend(results.get(name, []))
+            
+            # If no articles from APIs, use mock data (unless they just ran out of time)
+            if not all_articles and not skipped:
+                MOCK_FALLBACK_TOTAL.labels("no_articles").inc()
                 all_articles = await self._get_mock_news(symbol)
                 
         except Exception as e:
             print(f"Error fetching news: {e}")
             # Fallback to mock data
+            MOCK_FALLBACK_TOTAL.labels("error").inc()
             all_articles = await self._get_mock_news(symbol)
         
         return all_articles[:20]  # Limit to 20 most recent articles
@@ -119,21 +233,36 @@ class DataCollector:
             # Multiple financial RSS feeds
             rss_feeds = [
                 f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={symbol}&region=US&lang=en-US",
-                "https://www.investing.com/rss/news.rss",
-                "https://www.marketwatch.com/rss/topstories",
-                "https://seekingalpha.com/market_currents.xml",
+                *GENERIC_RSS_FEEDS,
             ]
         
-        articles = []
+        posts = await self.get_blog_posts_for_watchlist([symbol], rss_feeds)
+        return posts[symbol.upper()]
+
+    async def get_blog_posts_for_watchlist(self, symbols: List[str], rss_feeds: List[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Get blog posts from RSS feeds for many symbols, scanning each entry once"""
+        if rss_feeds is None:
+            rss_feeds = GENERIC_RSS_FEEDS
+        
+        routed = {symbol.upper(): [] for symbol in symbols}
+        key = symbols[0] if len(symbols) == 1 else "_all"
+        feeds = {}
         for feed_url in rss_feeds:
+            name = self.provider_for(feed_url)
+            feeds[name if name not in feeds else feed_url] = self._fetch_feed(feed_url, key)
+        
+        parsed, skipped = await gather_until_deadline(feeds)
+        self._report_skipped("blog", skipped)
+        for name, feed_url in zip(feeds, rss_feeds):
+            feed = parsed.get(name)
+            if feed is None:
+                continue
             try:
-                feed = feedparser.parse(feed_url)
-                for entry in feed.entries[:10]:  # Limit to 10 entries per feed
-                    title_lower = entry.get('title', '').lower()
-                    summary_lower = entry.get('summary', '').lower()
-                    
-                    if symbol.lower() in title_lower or symbol.lower() in summary_lower:
-                        articles.append({
+                # Limit to 10 entries per feed
+                matches = symbol_matcher.route(feed.entries[:10], routed.keys())
+                for symbol, entries in matches.items():
+                    for entry in entries:
+                        routed[symbol].append({
                             "title": entry.get('title', 'No title'),
                             "content": entry.get('summary', entry.get('description', '')),
                             "url": entry.get('link', ''),
@@ -143,14 +272,23 @@ class DataCollector:
             except Exception as e:
                 print(f"Error parsing RSS feed {feed_url}: {e}")
         
-        return articles
+        return routed
+
+    @staticmethod
+    def _report_skipped(kind: str, names: List[str]):
+        """Record sources cut off by the request deadline"""
+        deadline = current_deadline()
+        for name in names:
+            print(f"Deadline reached before {kind} source {name} answered")
+            if deadline:
+                deadline.skip(f"{kind}:{name}")
 
     async def _get_yahoo_finance_news(self, symbol: str) -> List[Dict[str, Any]]:
         """Get news from Yahoo Finance RSS"""
         articles = []
         try:
             feed_url = f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={symbol}&region=US&lang=en-US"
-            feed = feedparser.parse(feed_url)
+            feed = await self._fetch_feed(feed_url, symbol)
             
             for entry in feed.entries[:5]:
                 articles.append({
@@ -170,7 +308,7 @@ class DataCollector:
         articles = []
         try:
             feed_url = f"https://news.google.com/rss/search?q={symbol}+stock+when:7d&hl=en-US&gl=US&ceid=US:en"
-            feed = feedparser.parse(feed_url)
+            feed = await self._fetch_feed(feed_url, symbol)
             
             for entry in feed.entries[:5]:
                 articles.append({
@@ -189,23 +327,20 @@ class DataCollector:
         """Get news from Finnhub API (requires API key)"""
         articles = []
         try:
-            session = await self.get_session()
             from_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
             to_date = datetime.now().strftime('%Y-%m-%d')
             
             url = f"https://finnhub.io/api/v1/company-news?symbol={symbol}&from={from_date}&to={to_date}&token={self.finnhub_api_key}"
             
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    for item in data[:5]:
-                        articles.append({
-                            "title": item.get('headline', ''),
-                            "content": item.get('summary', ''),
-                            "url": item.get('url', ''),
-                            "published": datetime.fromtimestamp(item.get('datetime', 0)).isoformat(),
-                            "source": item.get('source', 'Finnhub')
-                        })
+            data = await self._fetch_json(url, symbol, self.finnhub_api_key)
+            for item in (data or [])[:5]:
+                articles.append({
+                    "title": item.get('headline', ''),
+                    "content": item.get('summary', ''),
+                    "url": item.get('url', ''),
+                    "published": datetime.fromtimestamp(item.get('datetime', 0)).isoformat(),
+                    "source": item.get('source', 'Finnhub')
+                })
         except Exception as e:
             print(f"Finnhub error: {e}")
         
@@ -215,22 +350,19 @@ class DataCollector:
         """Get news from NewsAPI (requires API key)"""
         articles = []
         try:
-            session = await self.get_session()
             from_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
             
             url = f"https://newsapi.org/v2/everything?q={symbol}+stock&from={from_date}&sortBy=publishedAt&language=en&apiKey={api_key}"
             
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    for item in data.get('articles', [])[:5]:
-                        articles.append({
-                            "title": item.get('title', ''),
-                            "content": item.get('description', ''),
-                            "url": item.get('url', ''),
-                            "published": item.get('publishedAt', datetime.now().isoformat()),
-                            "source": item.get('source', {}).get('name', 'NewsAPI')
-                        })
+            data = await self._fetch_json(url, symbol, api_key)
+            for item in (data or {}).get('articles', [])[:5]:
+                articles.append({
+                    "title": item.get('title', ''),
+                    "content": item.get('description', ''),
+                    "url": item.get('url', ''),
+                    "published": item.get('publishedAt', datetime.now().isoformat()),
+                    "source": item.get('source', {}).get('name', 'NewsAPI')
+                })
         except Exception as e:
             print(f"NewsAPI error: {e}")
         
@@ -0,0 +1,303 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.schemas import SentimentLabel, SentimentResponse
+from app.utils.metrics import CACHE_REQUESTS_TOTAL
+
+# Random-hyperplane LSH: each table hashes a vector to a 16-bit bucket
+LSH_TABLES = 8
+LSH_BITS = 16
+# Texts within this many SimHash bits of an indexed text reuse its scores. Off
+# (0: identical text only) by default: a few bits can be a flipped meaning, e.g.
+# "expects" vs "no longer expects" in a long article
+REUSE_MAX_DISTANCE = int(os.getenv("EMBEDDING_REUSE_DISTANCE", "0"))
+# The vector file grows by at least this many rows at a time
+GROW_ROWS = 65536
+
+WORD = re.compile(r"\w+")
+
+
+def _signed(value: int) -> int:
+    """uint64 -> int64, as SQLite stores integers signed"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over words and word pairs; near-identical texts differ in few bits"""
+    words = WORD.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+    digests = np.array(
+        [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "big") for f in features],
+        dtype=np.uint64,
+    )
+    bits = (digests[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = 2 * bits.sum(axis=0, dtype=np.int64) - len(features)
+    return sum(1 << int(bit) for bit in np.flatnonzero(votes > 0))
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class EmbeddingIndex:
+    """
+    Append-only store of FinBERT article embeddings on disk.
+
+    Vectors live in a memory-mapped float16 matrix (row i = article i), so
+    resident memory stays flat however many articles are indexed; the OS pages
+    rows in as queries touch them. Lookup structures are indexed SQLite
+    columns: LSH buckets for nearest-neighbour search and SimHash bands for
+    spotting near-duplicate texts whose scores can be reused.
+
+    Safe for several processes (gunicorn workers) sharing one directory:
+    SQLite allocates rows and the file is grown under an exclusive lock.
+    """
+
+    def __init__(self, directory: str, seed: int = 7):
+        self.directory = directory
+        self.seed = seed
+        self.dim: Optional[int] = None
+        self._planes: Optional[np.ndarray] = None
+        self._vectors: Optional[np.memmap] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    # Storage
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-process connection (never reuse one inherited across fork)"""
+        if self._db is None or self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(f"""
+                CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS articles (
+                    row INTEGER PRIMARY KEY, text_key TEXT, text TEXT,
+                    sentiment TEXT, confidence REAL, raw_scores TEXT, simhash INTEGER,
+                    {", ".join(f"b{band} INTEGER" for band in range(4))},
+                    {", ".join(f"l{table} INTEGER" for table in range(LSH_TABLES))}
+                );
+                CREATE INDEX IF NOT EXISTS articles_text_key ON articles (text_key);
+                {"".join(f"CREATE INDEX IF NOT EXISTS articles_b{band} ON articles (b{band});" for band in range(4))}
+                {"".join(f"CREATE INDEX IF NOT EXISTS articles_l{t} ON articles (l{t});" for t in range(LSH_TABLES))}
+                CREATE TABLE IF NOT EXISTS annotations (
+                    text_key TEXT PRIMARY KEY, symbol TEXT, title TEXT, url TEXT, source TEXT, published TEXT
+                );
+            """)
+            self._pid = os.getpid()
+            self._vectors = None
+            row = self._db.execute("SELECT value FROM settings WHERE key = 'dim'").fetchone()
+            if row:
+                self._set_dim(int(row[0]))
+        return self._db
+
+    def _set_dim(self, dim: int):
+        self.dim = dim
+        rng = np.random.default_rng(self.seed)
+        self._planes = rng.standard_normal((LSH_TABLES * LSH_BITS, dim)).astype(np.float32)
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, "vectors.f16")
+
+    def _map(self, rows_needed: int = 0) -> np.memmap:
+        """Map the vector file, growing it first if it can't hold rows_needed rows"""
+        row_bytes = self.dim * 2
+        path = self._path()
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if rows_needed * row_bytes > size:
+            with open(path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                size = os.path.getsize(path)
+                if rows_needed * row_bytes > size:
+                    capacity = max(rows_needed, 2 * (size // row_bytes), GROW_ROWS)
+                    f.truncate(capacity * row_bytes)
+                    size = capacity * row_bytes
+                fcntl.flock(f, fcntl.LOCK_UN)
+        if self._vectors is None or self._vectors.shape[0] * row_bytes < size:
+            self._vectors = np.memmap(path, dtype=np.float16, mode="r+", shape=(size // row_bytes, self.dim))
+        return self._vectors
+
+    def _lsh_codes(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, LSH_TABLES) bucket ids"""
+        bits = (vectors @ self._planes.T > 0).reshape(len(vectors), LSH_TABLES, LSH_BITS)
+        return (bits * (1 << np.arange(LSH_BITS))).sum(axis=2)
+
+    # Writes
+
+    def add(self, texts: Sequence[str], vectors: np.ndarray, responses: Sequence[SentimentResponse]):
+        """Index freshly scored texts with their pooled embeddings"""
+        if not len(texts):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            db = self._connect()
+            if self.dim is None:
+                db.execute("INSERT OR IGNORE INTO settings VALUES ('dim', ?)", (str(vectors.shape[1]),))
+                db.commit()
+                self._set_dim(int(db.execute("SELECT value FROM settings WHERE key = 'dim'").fetchone()[0]))
+            codes = self._lsh_codes(vectors)
+
+            # Rows become visible on commit, after their vectors are on the map
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = []
+                for text, code, response in zip(texts, codes, responses):
+                    sh = simhash(text)
+                    cursor = db.execute(
+                        f"INSERT INTO articles VALUES (NULL, ?, ?, ?, ?, ?, ?, {', '.join('?' * (4 + LSH_TABLES))})",
+                        (
+                            text_key(text), text[:1000], response.sentiment.value, response.confidence,
+                            json.dumps(response.raw_scores), _signed(sh),
+                            *[(sh >> (16 * band)) & 0xFFFF for band in range(4)],
+                            *[int(c) for c in code],
+                        ),
+                    )
+                    rows.append(cursor.lastrowid)
+                matrix = self._map(max(rows) + 1)
+                matrix[rows] = vectors.astype(np.float16)
+                matrix.flush()
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+    def annotate(self, symbol: str, texts: Sequence[str], articles: Sequence[Dict[str, Any]]):
+        """Attach article metadata (title, url, ...) to texts, for related-article results"""
+        with self._lock:
+            db = self._connect()
+            db.executemany(
+                "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (text_key(text), symbol, article.get("title"), article.get("url"),
+                     article.get("source"), article.get("published"))
+                    for text, article in zip(texts, articles) if text
+                ],
+            )
+            db.commit()
+
+    # Reads
+
+    def find_duplicate(self, text: str) -> Optional[Tuple[int, SentimentResponse]]:
+        """An indexed text identical (or, if enabled, nearly identical) to `text`, with its scores"""
+        sh = simhash(text) if REUSE_MAX_DISTANCE > 0 else 0
+        with self._lock:
+            db = self._connect()
+            exact = db.execute(
+                "SELECT row, sentiment, confidence, raw_scores FROM articles WHERE text_key = ? LIMIT 1",
+                (text_key(text),),
+            ).fetchone()
+            if exact:
+                match = exact
+            elif REUSE_MAX_DISTANCE <= 0:
+                match = None
+            else:
+                # Within REUSE_MAX_DISTANCE (< 4) bits, at least one 16-bit band is identical
+                bands = [(sh >> (16 * band)) & 0xFFFF for band in range(4)]
+                candidates = db.execute(
+                    "SELECT row, sentiment, confidence, raw_scores, simhash FROM articles "
+                    "WHERE b0 = ? OR b1 = ? OR b2 = ? OR b3 = ? LIMIT 200",
+                    bands,
+                ).fetchall()
+                scored = [
+                    (bin((candidate[4] & 0xFFFFFFFFFFFFFFFF) ^ sh).count("1"), candidate)
+                    for candidate in candidates
+                ]
+                scored = [(distance, c) for distance, c in scored if distance <= REUSE_MAX_DISTANCE]
+                match = min(scored, key=lambda item: item[0])[1][:4] if scored else None
+
+        CACHE_REQUESTS_TOTAL.labels("near_duplicate_scores", "hit" if match else "miss").inc()
+        if match is None:
+            return None
+        row, sentiment, confidence, raw_scores = match
+        return row, SentimentResponse(
+            sentiment=SentimentLabel(sentiment), confidence=confidence, raw_scores=json.loads(raw_scores)
+        )
+
+    def vector(self, text: str) -> Optional[np.ndarray]:
+        """Stored embedding of an indexed text, if this exact text is indexed"""
+        with self._lock:
+            db = self._connect()
+            if self.dim is None:
+                return None
+            found = db.execute("SELECT row FROM articles WHERE text_key = ? LIMIT 1", (text_key(text),)).fetchone()
+            if found is None:
+                return None
+            return self._map()[found[0]].astype(np.float32)
+
+    def related(self, vector: np.ndarray, k: int = 10, exclude_text: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Approximate nearest neighbours of an embedding, most similar first.
+
+        Only annotated rows (collected articles) are returned: the index also
+        holds texts callers submitted for scoring, which aren't shared.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        own_key = text_key(exclude_text) if exclude_text is not None else None
+        with self._lock:
+            db = self._connect()
+            if self.dim is None:
+                return []
+            codes = [int(c) for c in self._lsh_codes(query[None, :])[0]]
+            candidates = db.execute(
+                "SELECT a.row, a.text_key FROM articles a JOIN annotations n ON n.text_key = a.text_key WHERE "
+                + " OR ".join(f"a.l{t} = ?" for t in range(LSH_TABLES))
+                + " LIMIT 5000",
+                codes,
+            ).fetchall()
+            # Skip the query text itself and verbatim copies of it
+            candidate_rows = [r for r, key in candidates if key != own_key]
+            if not candidate_rows:
+                return []
+
+            matrix = self._map()
+            similarities = matrix[candidate_rows].astype(np.float32) @ query
+            best = np.argsort(-similarities)[:k]
+            top_rows = [candidate_rows[i] for i in best]
+
+            details = {
+                r[0]: r for r in db.execute(
+                    "SELECT a.row, a.text, a.sentiment, a.confidence, n.symbol, n.title, n.url, n.source, n.published "
+                    f"FROM articles a JOIN annotations n ON n.text_key = a.text_key "
+                    f"WHERE a.row IN ({', '.join('?' * len(top_rows))})",
+                    top_rows,
+                ).fetchall()
+            }
+
+        return [
+            {
+                "id": r,
+                "similarity": round(float(similarities[i]), 4),
+                "text": details[r][1],
+                "sentiment": details[r][2],
+                "confidence": details[r][3],
+                "symbol": details[r][4],
+                "title": details[r][5],
+                "url": details[r][6],
+                "source": details[r][7],
+                "published": details[r][8],
+            }
+            for i, r in zip(best, top_rows)
+        ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+
+# Global instance; enabled by pointing EMBEDDING_INDEX_DIR at a writable directory
+embedding_index = EmbeddingIndex(os.environ["EMBEDDING_INDEX_DIR"]) if os.getenv("EMBEDDING_INDEX_DIR") else None
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.utils.metrics import INFERENCE_QUEUE_DEPTH, INFERENCE_QUEUE_WAIT_SECONDS
+
+# Lanes and their share of inference when all are busy: single UI requests,
+# whole-symbol analyses, and /batch-style bulk jobs (which otherwise get
+# whatever capacity is spare)
+INTERACTIVE = "interactive"
+ANALYSIS = "analysis"
+BULK = "bulk"
+LANE_WEIGHTS = {INTERACTIVE: 8, ANALYSIS: 4, BULK: 1}
+
+
+class InferenceJob:
+    """Texts submitted together; resolved once every text is scored"""
+
+    def __init__(self, texts: List[str], future: asyncio.Future):
+        self.texts = texts
+        self.results: List[Any] = [None] * len(texts)
+        self.next = 0
+        self.remaining = len(texts)
+        self.future = future
+        self.submitted = time.perf_counter()
+
+    @property
+    def undispatched(self) -> int:
+        return len(self.texts) - self.next
+
+
+class Lane:
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        self.queue: Deque[InferenceJob] = deque()
+        # Stride-scheduling position: the lane with the lowest pass goes next
+        self.pass_value = 0.0
+
+
+class InferenceScheduler:
+    """
+    Weighted fair scheduler in front of a synchronous batch scorer.
+
+    Jobs queue per lane; a single dispatcher builds chunks of up to
+    `chunk_size` texts from the lane that is furthest behind its fair share
+    and scores them off the event loop. Big jobs are re-queued between
+    chunks, so an interactive request waits for at most one chunk.
+    """
+
+    def __init__(self, runner: Callable[[List[str]], List[Any]], rate_limit: float, chunk_size: int):
+        self.runner = runner
+        self.rate_limit = rate_limit
+        self.chunk_size = chunk_size
+        self.lanes = {name: Lane(name, weight) for name, weight in LANE_WEIGHTS.items()}
+        self._virtual_time = 0.0
+        # Texts-per-second limit as a token bucket with one second of burst; the
+        # bucket holds at least one token so fractional rates (0.5/s = one text
+        # every two seconds) can still dispatch
+        self._capacity = max(1.0, float(rate_limit))
+        self._tokens = self._capacity
+        self._tokens_updated = time.monotonic()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def submit(self, texts: List[str], lane: str = INTERACTIVE) -> List[Any]:
+        """Queue texts in a lane and wait for their scores"""
+        if not texts:
+            return []
+        self._ensure_dispatcher()
+        job = InferenceJob(texts, asyncio.get_running_loop().create_future())
+
+        queue_lane = self.lanes[lane]
+        if not queue_lane.queue:
+            # A lane that was idle doesn't get credit for the time it sat out
+            queue_lane.pass_value = max(queue_lane.pass_value, self._virtual_time)
+        queue_lane.queue.append(job)
+        INFERENCE_QUEUE_DEPTH.inc(len(texts))
+        self._wakeup.set()
+        return await job.future
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {name: sum(job.undispatched for job in lane.queue) for name, lane in self.lanes.items()}
+
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch_loop())
+
+    def _next_lane(self) -> Optional[Lane]:
+        for lane in self.lanes.values():
+            # Drop jobs whose caller went away (cancelled, e.g. by a request deadline)
+            while lane.queue and lane.queue[0].future.done():
+                INFERENCE_QUEUE_DEPTH.dec(lane.queue.popleft().undispatched)
+        busy = [lane for lane in self.lanes.values() if lane.queue]
+        return min(busy, key=lambda lane: lane.pass_value) if busy else None
+
+    async def _wait_for_token(self):
+        if self.rate_limit <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._tokens_updated) * self.rate_limit)
+            self._tokens_updated = now
+            if self._tokens >= 1:
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate_limit)
+
+    def _take_chunk(self, lane: Lane) -> List[Tuple[InferenceJob, int]]:
+        """Up to chunk_size texts from the front of a lane, possibly spanning jobs"""
+        size = self.chunk_size
+        if self.rate_limit > 0:
+            size = max(1, min(size, int(self._tokens)))
+        chunk = []
+        while lane.queue and len(chunk) < size:
+            job = lane.queue[0]
+            if job.future.done():
+                INFERENCE_QUEUE_DEPTH.dec(lane.queue.popleft().undispatched)
+                continue
+            if job.next == 0:
+                INFERENCE_QUEUE_WAIT_SECONDS.labels(lane.name).observe(time.perf_counter() - job.submitted)
+            take = min(size - len(chunk), len(job.texts) - job.next)
+            chunk.extend((job, i) for i in range(job.next, job.next + take))
+            job.next += take
+            if job.next == len(job.texts):
+                lane.queue.popleft()
+
+        if self.rate_limit > 0:
+            self._tokens -= len(chunk)
+        lane.pass_value += len(chunk) / lane.weight
+        self._virtual_time = lane.pass_value
+        INFERENCE_QUEUE_DEPTH.dec(len(chunk))
+        return chunk
+
+    async def _dispatch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Pick the lane after waiting, so work that arrived meanwhile can jump ahead
+            await self._wait_for_token()
+            lane = self._next_lane()
+            if lane is None:
+                continue
+            chunk = self._take_chunk(lane)
+            if not chunk:
+                continue
+
+            try:
+                results = await loop.run_in_executor(None, self.runner, [job.texts[i] for job, i in chunk])
+            except Exception as e:
+                for job, _ in chunk:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+
+            for (job, i), result in zip(chunk, results):
+                job.results[i] = result
+                job.remaining -= 1
+                if job.remaining == 0 and not job.future.done():
+                    job.future.set_result(job.results)
@@ -0,0 +1,235 @@
+import asyncio
+import ctypes
+import gc
+import os
+import time
+from typing import Any, Dict, Optional
+
+from app.services.sentiment_analyzer import sentiment_analyzer
+from app.utils.cache import CACHES
+from app.utils.metrics import CACHE_SIZE_BYTES, MEMORY_ACTIONS_TOTAL
+
+
+def read_memory() -> Optional[int]:
+    """
+    This process's proportional set size (PSS) in bytes.
+
+    Unlike RSS, pages shared copy-on-write with the gunicorn master and the
+    other workers (the preloaded model) count only by this worker's share, so
+    per-worker usages add up to what the container actually holds. Falls back
+    to RSS where PSS isn't available (non-Linux).
+    """
+    try:
+        import psutil
+        info = psutil.Process().memory_full_info()
+        return getattr(info, "pss", info.rss)
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _container_limit() -> Optional[int]:
+    """cgroup (v2 or v1) memory limit, if the host sets one"""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+def _release_freed_memory():
+    """Collect garbage and hand freed heap pages back to the OS so RSS actually drops"""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class MemoryManager:
+    """
+    Keeps this process under a memory budget.
+
+    Above the high watermark, caches are halved in priority order (never
+    below a floor) until usage drops; above the critical watermark the
+    transformer is unloaded and the lightweight scorer takes over. Below the
+    high watermark shrunk caches grow back to their default sizes; below the
+    low watermark they may grow past them, and an unloaded model comes back
+    once there is room for it again. Caches holding state (not shrinkable)
+    are left alone.
+
+    A model preloaded by the gunicorn master is never unloaded in a worker:
+    the master keeps its pages, so dropping it frees nothing and reloading
+    would give the worker a private copy.
+    """
+
+    def __init__(self):
+        budget_mb = os.getenv("MEMORY_BUDGET_MB")
+        if budget_mb:
+            self.budget = int(float(budget_mb) * 1024 * 1024)
+        else:
+            # Share a container limit between gunicorn workers
+            limit = _container_limit()
+            workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+            self.budget = limit // workers if limit else None
+
+        self.low = float(os.getenv("MEMORY_LOW_WATERMARK", "0.6"))
+        self.high = float(os.getenv("MEMORY_HIGH_WATERMARK", "0.85"))
+        self.critical = float(os.getenv("MEMORY_CRITICAL_WATERMARK", "0.95"))
+        self.interval = float(os.getenv("MEMORY_CHECK_INTERVAL", "5"))
+        self.cache_growth = float(os.getenv("MEMORY_CACHE_GROWTH", "4"))
+        self.cache_floor = float(os.getenv("MEMORY_CACHE_FLOOR", "0.1"))
+        self.reload_cooldown = float(os.getenv("MEMORY_MODEL_RELOAD_COOLDOWN", "300"))
+
+        self.model_unloaded_at: Optional[float] = None
+        self.model_footprint = 0
+        self.last_action = "none"
+        self._reloading = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget is not None and read_memory() is not None
+
+    def start(self):
+        if self.enabled and self._task is None:
+            print(f"Memory manager watching a {self.budget // 2**20} MB budget")
+            self._task = asyncio.create_task(self._watch())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            try:
+                action = self.check()
+                if action == "unload_model":
+                    await self._unload_model()
+                elif action == "reload_model":
+                    await self._reload_model()
+            except Exception as e:
+                print(f"Memory check failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def usage(self) -> float:
+        return (read_memory() or 0) / self.budget
+
+    def check(self) -> str:
+        """One pass of the control loop; returns the action taken"""
+        for cache in CACHES:
+            CACHE_SIZE_BYTES.labels(cache.name).set(cache.bytes)
+
+        action = "none"
+        usage = self.usage()
+        if usage >= self.high:
+            action = self._shrink_caches()
+            if self.usage() >= self.critical and self._can_unload_model():
+                action = "unload_model"
+        else:
+            # Headroom: shrunk caches recover; spare memory lets them grow past default
+            action = self._grow_caches(self.cache_growth if usage < self.low else 1.0)
+            if usage < self.low and self._can_reload_model():
+                action = "reload_model"
+
+        if action != "none":
+            self.last_action = action
+            MEMORY_ACTIONS_TOTAL.labels(action).inc()
+        return action
+
+    def _floor(self, cache) -> int:
+        """Smallest size a cache is shrunk to, so it keeps working under pressure"""
+        return max(1, int(cache.maxsize * self.cache_floor))
+
+    def _shrink_caches(self) -> str:
+        """Halve caches, cheapest to rebuild first, until back under the high watermark"""
+        shrinkable = [cache for cache in CACHES if cache.shrinkable]
+        for priority in sorted({cache.priority for cache in shrinkable}):
+            for cache in shrinkable:
+                if cache.priority == priority:
+                    cache.purge_expired()
+                    cache.resize(max(self._floor(cache), len(cache) // 2))
+            _release_freed_memory()
+            if self.usage() < self.high:
+                break
+        return "shrink_caches"
+
+    def _grow_caches(self, growth: float) -> str:
+        """Double shrunk caches back towards, and with spare memory past, their default size"""
+        grown = False
+        for cache in CACHES:
+            if not cache.shrinkable:
+                continue
+            ceiling = max(cache.maxsize, int(cache.maxsize * growth))
+            if cache.limit < ceiling:
+                cache.resize(min(ceiling, max(cache.limit * 2, self._floor(cache))))
+                grown = True
+        return "grow_caches" if grown else "none"
+
+    def _can_unload_model(self) -> bool:
+        return sentiment_analyzer.backend != "lightweight" and not sentiment_analyzer.model_inherited
+
+    async def _unload_model(self):
+        """Drop the transformer once in-flight batches finish (off the event loop, as it may wait)"""
+        before = read_memory() or 0
+        await asyncio.to_thread(sentiment_analyzer.unload_model)
+        _release_freed_memory()
+        self.model_footprint = max(self.model_footprint, before - (read_memory() or 0))
+        self.model_unloaded_at = time.monotonic()
+
+    def _can_reload_model(self) -> bool:
+        """Hysteresis: wait out the cooldown, then only reload if the model fits under the high watermark"""
+        if self.model_unloaded_at is None or self._reloading:
+            return False
+        if time.monotonic() - self.model_unloaded_at < self.reload_cooldown:
+            return False
+        return (read_memory() or 0) + self.model_footprint < self.high * self.budget
+
+    async def _reload_model(self):
+        self._reloading = True
+        try:
+            await asyncio.to_thread(sentiment_analyzer.reload_model)
+            self.model_unloaded_at = None
+        except Exception as e:
+            print(f"Model reload failed, staying on lightweight scoring: {e}")
+            self.model_unloaded_at = time.monotonic()
+        finally:
+            self._reloading = False
+
+    def status(self) -> Dict[str, Any]:
+        pss = read_memory()
+        return {
+            "enabled": self.enabled,
+            "pss_mb": round(pss / 2**20, 1) if pss else None,
+            "budget_mb": round(self.budget / 2**20, 1) if self.budget else None,
+            "usage": round(pss / self.budget, 3) if pss and self.budget else None,
+            "backend": sentiment_analyzer.backend,
+            "model_shared": sentiment_analyzer.model_inherited,
+            "last_action": self.last_action,
+            "caches": {
+                cache.name: {"entries": len(cache), "limit": cache.limit, "bytes": cache.bytes}
+                for cache in CACHES
+            },
+        }
+
+
+# Global instance
+memory_manager = MemoryManager()
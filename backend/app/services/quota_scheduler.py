@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import QUOTA_REQUESTS_TOTAL
+
+# How quickly a symbol's demand score fades (seconds for it to halve)
+DEMAND_HALF_LIFE = float(os.getenv("QUOTA_DEMAND_HALF_LIFE", "900"))
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _worker_share(limit: Optional[int], workers: int) -> Optional[int]:
+    """This process's slice of a provider limit (never rounded up, so the total stays under it)"""
+    return max(1, limit // workers) if limit else limit
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_available(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def empty(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+
+class KeyQuota:
+    """Quota state for one provider API key, with a priority queue of waiting calls"""
+
+    def __init__(self, provider: str, per_minute: Optional[int], per_day: Optional[int],
+                 minute_burst: Optional[int], day_burst: Optional[int]):
+        self.provider = provider
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.buckets: List[TokenBucket] = []
+        if per_minute:
+            self.buckets.append(TokenBucket(minute_burst or per_minute, per_minute / 60))
+        if per_day:
+            # Small burst + steady refill spreads the daily budget over the whole day
+            self.buckets.append(TokenBucket(day_burst or max(1, per_day // 24), per_day / 86400))
+        self.used_today = 0
+        self.day = datetime.now(timezone.utc).date()
+        self.blocked_until = 0.0
+        self.stats = {"granted": 0, "denied": 0, "throttled": 0}
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _roll_day(self):
+        today = datetime.now(timezone.utc).date()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+
+    def time_until_available(self) -> float:
+        """Seconds until a call could be made under every limit"""
+        self._roll_day()
+        now = time.monotonic()
+        if self.per_day and self.used_today >= self.per_day:
+            midnight = datetime.combine(self.day + timedelta(days=1), datetime.min.time(), timezone.utc)
+            return (midnight - datetime.now(timezone.utc)).total_seconds()
+        waits = [bucket.time_until_available() for bucket in self.buckets]
+        return max([self.blocked_until - now, 0.0, *waits])
+
+    async def acquire(self, priority: float, timeout: float) -> bool:
+        """Wait (up to timeout) for a call slot; higher priority is served first"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._sequence), future))
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats["denied"] += 1
+            QUOTA_REQUESTS_TOTAL.labels(self.provider, "denied").inc()
+            return False
+
+    def _dispatch(self):
+        """Hand available tokens to the highest-priority waiters"""
+        if self._timer:
+            self._timer.cancel()
+        self._timer = None
+        while self._waiters:
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)  # timed out while queued
+                continue
+
+            wait = self.time_until_available()
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            _, _, future = heapq.heappop(self._waiters)
+            for bucket in self.buckets:
+                bucket.take()
+            self.used_today += 1
+            self.stats["granted"] += 1
+            QUOTA_REQUESTS_TOTAL.labels(self.provider, "granted").inc()
+            future.set_result(True)
+
+    def throttled(self, retry_after: Optional[float]):
+        """The provider answered 429: stop calling until it lets us back in"""
+        self.stats["throttled"] += 1
+        QUOTA_REQUESTS_TOTAL.labels(self.provider, "throttled").inc()
+        for bucket in self.buckets:
+            bucket.empty()
+        self.blocked_until = max(self.blocked_until, time.monotonic() + (retry_after or 60))
+
+    def status(self) -> Dict[str, Any]:
+        self._roll_day()
+        return {
+            "provider": self.provider,
+            "per_minute": self.per_minute,
+            "per_day": self.per_day,
+            "remaining_today": self.per_day - self.used_today if self.per_day else None,
+            "tokens_available": [round(min(b.capacity, b.tokens), 2) for b in self.buckets],
+            "next_call_in_seconds": round(self.time_until_available(), 1),
+            "waiting": sum(1 for _, _, future in self._waiters if not future.done()),
+            **self.stats,
+        }
+
+
+class QuotaScheduler:
+    """
+    Per-API-key scheduler for rate-limited news providers.
+
+    Calls queue for a token, symbols in higher demand go first, and the daily
+    budget is released gradually instead of in one burst.
+
+    State is per process, so with several gunicorn workers (WEB_CONCURRENCY)
+    each one schedules against an equal share of every limit.
+    """
+
+    def __init__(self):
+        self.max_wait = float(os.getenv("QUOTA_MAX_WAIT", "5"))
+        self.workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+        self.limits: Dict[str, Dict[str, Optional[int]]] = {}
+        self.quotas: Dict[str, KeyQuota] = {}
+        # Symbol -> (score, updated); entries idle for ~8 half-lives have decayed to nothing.
+        # Scheduling state, not a cache of anything, so it is never shrunk
+        self._demand = TTLCache("quota_demand", ttl=8 * DEMAND_HALF_LIFE, maxsize=4096, priority=0, shrinkable=False)
+
+    def register(self, provider: str, per_minute: Optional[int] = None, per_day: Optional[int] = None,
+                 minute_burst: Optional[int] = None, day_burst: Optional[int] = None):
+        self.limits[provider] = {
+            "per_minute": _worker_share(per_minute, self.workers),
+            "per_day": _worker_share(per_day, self.workers),
+            "minute_burst": _worker_share(minute_burst, self.workers),
+            "day_burst": _worker_share(day_burst, self.workers),
+        }
+
+    def has_quota(self, provider: str) -> bool:
+        return provider in self.limits
+
+    def _quota(self, provider: str, api_key: str) -> KeyQuota:
+        key_id = f"{provider}:{hashlib.sha1(api_key.encode()).hexdigest()[:8]}"
+        quota = self.quotas.get(key_id)
+        if quota is None:
+            quota = self.quotas[key_id] = KeyQuota(provider, **self.limits[provider])
+        return quota
+
+    def record_demand(self, symbol: str):
+        """Note that a client asked for this symbol"""
+        now = time.monotonic()
+        self._demand.set(symbol, (self.demand(symbol) + 1, now))
+
+    def demand(self, symbol: str) -> float:
+        score, updated = self._demand.get(symbol) or (0.0, time.monotonic())
+        return score * math.pow(0.5, (time.monotonic() - updated) / DEMAND_HALF_LIFE)
+
+    async def acquire(self, provider: str, api_key: str, symbol: str) -> bool:
+        """Wait for permission to call a provider for a symbol"""
+        return await self._quota(provider, api_key).acquire(self.demand(symbol), self.max_wait)
+
+    def report_throttled(self, provider: str, api_key: str, retry_after: Optional[float] = None):
+        self._quota(provider, api_key).throttled(retry_after)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Remaining budget per provider key"""
+        return [{"key": key_id, **quota.status()} for key_id, quota in self.quotas.items()]
+
+
+quota_scheduler = QuotaScheduler()
+# Free-tier limits by default: Finnhub 60 calls/minute, NewsAPI 100 requests/day
+quota_scheduler.register(
+    "finnhub",
+    per_minute=int(os.getenv("FINNHUB_RATE_PER_MINUTE", "60")),
+    per_day=_env_int("FINNHUB_RATE_PER_DAY"),
+    minute_burst=_env_int("FINNHUB_BURST"),
+)
+quota_scheduler.register(
+    "newsapi",
+    per_minute=_env_int("NEWSAPI_RATE_PER_MINUTE"),
+    per_day=int(os.getenv("NEWSAPI_RATE_PER_DAY", "100")),
+    day_burst=_env_int("NEWSAPI_BURST"),
+)
@@ -0,0 +1,19 @@
+import os
+from typing import Dict
+
+from app.models.schemas import SourceType
+
+# Shared by AnalysisEngine and the backtester (which must not import the engine
+# and, with it, the model)
+
+# Weight of each source in the overall sentiment; unlisted sources count DEFAULT_SOURCE_WEIGHT
+SOURCE_WEIGHTS: Dict[SourceType, float] = {
+    SourceType.NEWS: 0.4,
+    SourceType.YOUTUBE: 0.3,
+    SourceType.BLOG: 0.2,
+    SourceType.SOCIAL: 0.1
+}
+DEFAULT_SOURCE_WEIGHT = 0.1
+
+# Overall confidence above which positive/negative sentiment becomes a buy/sell call
+ACTION_CONFIDENCE_THRESHOLD = float(os.getenv("RECOMMENDATION_CONFIDENCE_THRESHOLD", "0.7"))
@@ -1,8 +1,35 @@
 import os
-from typing import List, Dict, Any, Optional
+import random
+import re
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from app.models.schemas import SentimentLabel, SentimentResponse
-import asyncio
-from asyncio_throttle import Throttler
+from app.utils.metrics import (
+    INFERENCE_BATCH_SECONDS, INFERENCE_BATCH_SIZE, INFERENCE_TEXTS_TOTAL,
+    CASCADE_DECISIONS_TOTAL, CASCADE_AGREEMENT_TOTAL
+)
+from app.utils.deadline import gather_until_deadline
+from app.services.embedding_index import embedding_index
+from app.services.inference_scheduler import InferenceScheduler, INTERACTIVE, BULK
+
+# Financial sentiment keywords for the lightweight scorer
+KEYWORDS = {
+    "positive": ['profit', 'gain', 'growth', 'increase', 'up', 'rise', 'bullish',
+                 'strong', 'positive', 'beat', 'exceed', 'outperform', 'success'],
+    "negative": ['loss', 'decline', 'decrease', 'down', 'fall', 'bearish',
+                 'weak', 'negative', 'miss', 'underperform', 'fail', 'risk'],
+    "neutral": ['stable', 'unchanged', 'maintain', 'hold', 'steady'],
+}
+# Whole words plus simple inflections, so "gain" matches "gains" but not "against"
+KEYWORD_PATTERNS = {
+    side: re.compile(r"\b(" + "|".join(words) + r")(?:s|es|ed|d|ing)?\b")
+    for side, words in KEYWORDS.items()
+}
+# A negator up to two words before a keyword ("not strong", "didn't really beat")
+NEGATION = re.compile(r"(?:\b(?:not|no|never|without|hardly|barely|nor)|n't)\s+(?:\w+\s+){0,2}$")
+# Audits needed before their agreement rate calibrates lexicon-accepted confidence
+CASCADE_MIN_AUDITS = 20
 
 class SentimentAnalyzer:
     def __init__(self):
@@ -10,10 +37,34 @@ class SentimentAnalyzer:
         self.tokenizer = None
         self.model = None
         self.classifier = None
-        self.throttler = Throttler(rate_limit=10, period=1)  # 10 requests per second
+        # Priority lanes in front of the model; 10 texts per second overall by default
+        self.scheduler = InferenceScheduler(
+            self.score_batch,
+            rate_limit=float(os.getenv("INFERENCE_RATE_LIMIT", "10")),
+            chunk_size=int(os.getenv("INFERENCE_CHUNK_SIZE", "16"))
+        )
         self._model_loaded = False
+        # Process that loaded the model; held by score_batch so unload_model() waits for in-flight batches
+        self._model_pid: Optional[int] = None
+        self._model_lock = threading.Lock()
         self._use_lightweight = os.getenv("USE_LIGHTWEIGHT_SENTIMENT", "false").lower() == "true"
         
+        # Cascade mode: lexicon scorer first, FinBERT only for ambiguous texts
+        self._cascade = os.getenv("SENTIMENT_CASCADE", "false").lower() == "true"
+        self.cascade_min_margin = float(os.getenv("CASCADE_MIN_MARGIN", "0.5"))
+        self.cascade_min_hits = int(os.getenv("CASCADE_MIN_HITS", "2"))
+        self.cascade_audit_rate = float(os.getenv("CASCADE_AUDIT_RATE", "0.0"))
+        # Lexicon confidence is a keyword ratio, not a probability; cap it so it
+        # doesn't outweigh FinBERT scores when sources are averaged
+        self.cascade_max_confidence = float(os.getenv("CASCADE_MAX_CONFIDENCE", "0.7"))
+        self.cascade_stats = {
+            "accepted": 0,          # settled by the lexicon scorer
+            "escalated": 0,         # sent on to the transformer
+            "escalated_agreed": 0,  # ...where the transformer agreed with the lexicon
+            "audited": 0,           # confident texts also checked by the transformer
+            "audited_agreed": 0,
+        }
+        
         # Only load heavy model if not using lightweight mode
         if not self._use_lightweight:
             try:
@@ -21,6 +72,9 @@ class SentimentAnalyzer:
             except Exception as e:
                 print(f"Failed to load transformer model, falling back to lightweight: {e}")
                 self._use_lightweight = True
+        
+        # Optional on-disk index of FinBERT embeddings (EMBEDDING_INDEX_DIR)
+        self.embedding_index = embedding_index if self._model_loaded else None
 
     def _load_model(self):
         """Load the FinBERT model (only when not in lightweight mode)"""
@@ -28,38 +82,71 @@ class SentimentAnalyzer:
             print("Loading FinBERT model...")
             from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
             
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
-            self.classifier = pipeline(
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+            model.eval()
+            classifier = pipeline(
                 "sentiment-analysis",
-                model=self.model,
-                tokenizer=self.tokenizer,
+                model=model,
+                tokenizer=tokenizer,
                 return_all_scores=True
             )
-            self._model_loaded = True
+            # Swap in only once loaded, so scoring isn't blocked while it loads
+            with self._model_lock:
+                self.tokenizer, self.model, self.classifier = tokenizer, model, classifier
+                self._model_loaded = True
+                self._model_pid = os.getpid()
             print("FinBERT model loaded successfully")
         except Exception as e:
             print(f"Error loading transformer model: {e}")
             raise
 
+    def unload_model(self):
+        """Free the transformer; scoring falls back to the lightweight backend until reload_model()"""
+        with self._model_lock:
+            if not self._model_loaded:
+                return
+            self._model_loaded = False
+            self.embedding_index = None
+            self.classifier = self.model = self.tokenizer = None
+        print("FinBERT model unloaded, using lightweight sentiment analysis")
+
+    @property
+    def model_inherited(self) -> bool:
+        """
+        Whether the model was loaded by a parent process (gunicorn preload) and
+        is shared copy-on-write; unloading it here would free nothing.
+        """
+        return self._model_loaded and self._model_pid != os.getpid()
+
+    def reload_model(self):
+        """Load the transformer again after unload_model()"""
+        if self._model_loaded or self._use_lightweight:
+            return
+        self._load_model()
+        self.embedding_index = embedding_index
+
+    def configure_threads(self, num_threads: int):
+        """Limit torch intra-op threads (used to partition cores between workers)"""
+        if not self._model_loaded:
+            return
+        try:
+            import torch
+            torch.set_num_threads(num_threads)
+        except Exception as e:
+            print(f"Could not set torch threads: {e}")
+
     def _lightweight_sentiment_analysis(self, text: str) -> SentimentResponse:
         """
         Lightweight sentiment analysis using simple keyword matching
         This is used when transformer models can't be loaded (e.g., low memory environments)
         """
-        text_lower = text.lower()
-        
-        # Financial sentiment keywords
-        positive_keywords = ['profit', 'gain', 'growth', 'increase', 'up', 'rise', 'bullish', 
-                           'strong', 'positive', 'beat', 'exceed', 'outperform', 'success']
-        negative_keywords = ['loss', 'decline', 'decrease', 'down', 'fall', 'bearish', 
-                           'weak', 'negative', 'miss', 'underperform', 'fail', 'risk']
-        neutral_keywords = ['stable', 'unchanged', 'maintain', 'hold', 'steady']
+        hits = self._keyword_hits(text)
         
-        # Count keyword occurrences
-        positive_count = sum(1 for word in positive_keywords if word in text_lower)
-        negative_count = sum(1 for word in negative_keywords if word in text_lower)
-        neutral_count = sum(1 for word in neutral_keywords if word in text_lower)
+        # Count distinct keywords per side
+        positive_count = len({word for word, _ in hits["positive"]})
+        negative_count = len({word for word, _ in hits["negative"]})
+        neutral_count = len({word for word, _ in hits["neutral"]})
         
         total_count = positive_count + negative_count + neutral_count
         
@@ -98,55 +185,260 @@ class SentimentAnalyzer:
             raw_scores=scores
         )
 
-    async def analyze_sentiment(self, text: str) -> SentimentResponse:
+    def _keyword_hits(self, text: str) -> Dict[str, List[Tuple[str, bool]]]:
+        """Every keyword occurrence per side, as (keyword, negated)"""
+        text_lower = text.lower()
+        return {
+            side: [
+                (match.group(1), bool(NEGATION.search(text_lower, max(0, match.start() - 40), match.start())))
+                for match in pattern.finditer(text_lower)
+            ]
+            for side, pattern in KEYWORD_PATTERNS.items()
+        }
+
+    @property
+    def backend(self) -> str:
+        """Name of the scorer currently in use"""
+        if self._use_lightweight or not self._model_loaded:
+            return "lightweight"
+        if self._cascade:
+            return "cascade"
+        return "transformer"
+
+    def _is_ambiguous(self, text: str, lexicon: SentimentResponse) -> bool:
+        """
+        Whether a lexicon score is too uncertain to stand on its own.
+
+        Besides a clear margin, the winning side needs `cascade_min_hits`
+        keyword occurrences and no keyword may be negated: a single match
+        ("beat") or a negated one ("not strong") is left to the transformer.
+        """
+        scores = sorted(lexicon.raw_scores.values(), reverse=True)
+        margin = scores[0] - scores[1]
+        conflicting = lexicon.raw_scores["positive"] > 0 and lexicon.raw_scores["negative"] > 0
+        if margin < self.cascade_min_margin or conflicting:
+            return True
+        hits = self._keyword_hits(text)
+        if any(negated for side_hits in hits.values() for _, negated in side_hits):
+            return True
+        return len(hits.get(lexicon.sentiment.value, [])) < self.cascade_min_hits
+
+    def _accepted_confidence(self) -> float:
+        """
+        Ceiling for the confidence of a lexicon-accepted text: the audited
+        agreement rate once enough audits exist, never above
+        `cascade_max_confidence`.
+        """
+        audited = self.cascade_stats["audited"]
+        if audited < CASCADE_MIN_AUDITS:
+            return self.cascade_max_confidence
+        return min(self.cascade_max_confidence, self.cascade_stats["audited_agreed"] / audited)
+
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        """Cascade routing and lexicon/transformer agreement, for tuning the margin"""
+        stats = self.cascade_stats
+        total = stats["accepted"] + stats["audited"] + stats["escalated"]
+        return {
+            "enabled": self.backend == "cascade",
+            "min_margin": self.cascade_min_margin,
+            "audit_rate": self.cascade_audit_rate,
+            "accepted_confidence_cap": self._accepted_confidence(),
+            **stats,
+            "escalation_rate": stats["escalated"] / total if total else 0.0,
+            "transformer_share": (stats["escalated"] + stats["audited"]) / total if total else 0.0,
+            "escalated_agreement": stats["escalated_agreed"] / stats["escalated"] if stats["escalated"] else None,
+            "audited_agreement": stats["audited_agreed"] / stats["audited"] if stats["audited"] else None,
+        }
+
+    async def analyze_sentiment(self, text: str, lane: str = INTERACTIVE) -> SentimentResponse:
         """Analyze sentiment of financial text"""
-        async with self.throttler:
-            try:
-                if not text or len(text.strip()) < 10:
-                    return SentimentResponse(
-                        sentiment=SentimentLabel.NEUTRAL,
-                        confidence=1.0,
-                        raw_scores={"positive": 0.33, "negative": 0.33, "neutral": 0.34}
-                    )
+        results = await self.scheduler.submit([text], lane)
+        return results[0]
 
-                # Use lightweight analysis if model not loaded
-                if self._use_lightweight or not self._model_loaded:
-                    return self._lightweight_sentiment_analysis(text)
+    def score_batch(self, texts: List[str], batch_size: int = 32) -> List[SentimentResponse]:
+        """
+        Score texts synchronously with the active backend.
 
-                # Preprocess text
-                processed_text = self._preprocess_text(text)
-                
-                # Get sentiment scores using transformer model
-                results = self.classifier(processed_text[:512])[0]  # Limit to 512 tokens
-                
-                # Convert to our format
-                sentiment_scores = {
-                    result['label']: result['score'] 
-                    for result in results
-                }
-                
-                # Determine dominant sentiment
-                dominant_sentiment = max(sentiment_scores, key=sentiment_scores.get)
-                confidence = sentiment_scores[dominant_sentiment]
-                
-                return SentimentResponse(
-                    sentiment=SentimentLabel(dominant_sentiment),
-                    confidence=confidence,
-                    raw_scores=sentiment_scores
+        Transformer inference runs in batches of `batch_size`; no throttling is
+        applied, so this is meant for offline jobs and executor threads.
+        """
+        # The whole batch runs with one backend: unload_model() waits for it
+        with self._model_lock:
+            # Model time only; lane queueing has INFERENCE_QUEUE_WAIT_SECONDS
+            backend = self.backend
+            start = time.perf_counter()
+            results = self._score_batch(texts, batch_size)
+            INFERENCE_BATCH_SECONDS.labels(backend).observe(time.perf_counter() - start)
+            INFERENCE_BATCH_SIZE.labels(backend).observe(len(texts))
+            return results
+
+    def _score_batch(self, texts: List[str], batch_size: int) -> List[SentimentResponse]:
+        responses: List[Optional[SentimentResponse]] = [None] * len(texts)
+        pending = []
+        lexicon_checks: Dict[int, Tuple[str, SentimentResponse]] = {}
+        skipped = 0
+        
+        for i, text in enumerate(texts):
+            if not text or len(text.strip()) < 10:
+                skipped += 1
+                responses[i] = SentimentResponse(
+                    sentiment=SentimentLabel.NEUTRAL,
+                    confidence=1.0,
+                    raw_scores={"positive": 0.33, "negative": 0.33, "neutral": 0.34}
                 )
+            elif self._use_lightweight or not self._model_loaded:
+                # Use lightweight analysis if model not loaded
+                responses[i] = self._lightweight_sentiment_analysis(text)
+            elif self._cascade:
+                lexicon = self._lightweight_sentiment_analysis(text)
+                if self._is_ambiguous(text, lexicon):
+                    lexicon_checks[i] = ("escalated", lexicon)
+                    pending.append(i)
+                elif random.random() < self.cascade_audit_rate:
+                    lexicon_checks[i] = ("audited", lexicon)
+                    pending.append(i)
+                else:
+                    self.cascade_stats["accepted"] += 1
+                    CASCADE_DECISIONS_TOTAL.labels("accepted").inc()
+                    responses[i] = lexicon.model_copy(
+                        update={"confidence": min(lexicon.confidence, self._accepted_confidence())}
+                    )
+            else:
+                pending.append(i)
+        
+        INFERENCE_TEXTS_TOTAL.labels("skipped").inc(skipped)
+        INFERENCE_TEXTS_TOTAL.labels("lightweight").inc(len(texts) - skipped - len(pending))
+        
+        if pending:
+            try:
+                # Preprocess and limit length before tokenization
+                processed = {i: self.index_text(texts[i]) for i in pending}
+                if self.embedding_index is not None:
+                    # Near-identical texts already scored by the transformer reuse those scores
+                    for i in list(pending):
+                        duplicate = self.embedding_index.find_duplicate(processed[i])
+                        if duplicate:
+                            responses[i] = duplicate[1]
+                            pending.remove(i)
+                    INFERENCE_TEXTS_TOTAL.labels("reused").inc(len(processed) - len(pending))
+                
+                INFERENCE_TEXTS_TOTAL.labels("transformer").inc(len(pending))
+                batch = [processed[i] for i in pending]
+                if self.embedding_index is not None and batch:
+                    outputs, embeddings = self._classify_with_embeddings(batch, batch_size)
+                elif batch:
+                    outputs = self.classifier(batch, batch_size=batch_size, truncation=True)
+                else:
+                    outputs = []
+                for i, results in zip(pending, outputs):
+                    responses[i] = self._from_label_scores(results)
+                if self.embedding_index is not None and batch:
+                    self.embedding_index.add(batch, embeddings, [responses[i] for i in pending])
                 
+                for i, (decision, lexicon) in lexicon_checks.items():
+                    self._record_cascade_check(decision, lexicon, responses[i])
             except Exception as e:
                 print(f"Error in sentiment analysis: {e}")
-                return SentimentResponse(
-                    sentiment=SentimentLabel.NEUTRAL,
-                    confidence=0.5,
-                    raw_scores={"positive": 0.33, "negative": 0.33, "neutral": 0.34}
-                )
+                for i in pending:
+                    responses[i] = SentimentResponse(
+                        sentiment=SentimentLabel.NEUTRAL,
+                        confidence=0.5,
+                        raw_scores={"positive": 0.33, "negative": 0.33, "neutral": 0.34}
+                    )
+        
+        return responses
+
+    def _classify_with_embeddings(self, texts: List[str], batch_size: int) -> Tuple[List[List[Dict[str, Any]]], Any]:
+        """
+        Run FinBERT directly rather than through the pipeline, returning the
+        pipeline-style label scores plus each text's mean-pooled embedding.
+        """
+        import numpy as np
+        import torch
+        
+        labels = self.model.config.id2label
+        outputs, embeddings = [], []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True, max_length=512, return_tensors="pt"
+            )
+            with torch.no_grad():
+                result = self.model(**inputs, output_hidden_states=True)
+            probabilities = torch.softmax(result.logits, dim=-1)
+            mask = inputs["attention_mask"].unsqueeze(-1)
+            pooled = (result.hidden_states[-1] * mask).sum(dim=1) / mask.sum(dim=1)
+            
+            outputs.extend(
+                [{"label": labels[j], "score": float(row[j])} for j in range(len(row))]
+                for row in probabilities
+            )
+            embeddings.append(pooled.numpy())
+        return outputs, np.concatenate(embeddings)
+
+    def related_articles(self, text: str, k: int = 10) -> List[Dict[str, Any]]:
+        """Collected articles most similar to a text (blocking: may run the model, reads SQLite and disk)"""
+        index = self.embedding_index
+        if index is None:
+            return []
+        processed = self.index_text(text)
+        vector = index.vector(processed)
+        if vector is None:
+            # Not indexed, e.g. settled by the cascade lexicon: embed it here
+            with self._model_lock:
+                if not self._model_loaded:
+                    return []
+                _, vectors = self._classify_with_embeddings([processed], 1)
+            vector = vectors[0]
+        return index.related(vector, k, exclude_text=processed)
+
+    def _record_cascade_check(self, decision: str, lexicon: SentimentResponse, transformer: SentimentResponse):
+        """Track whether the transformer agreed with the lexicon on a checked text"""
+        agreed = lexicon.sentiment == transformer.sentiment
+        self.cascade_stats[decision] += 1
+        if agreed:
+            self.cascade_stats[f"{decision}_agreed"] += 1
+        if decision == "escalated":
+            CASCADE_DECISIONS_TOTAL.labels("escalated").inc()
+        CASCADE_AGREEMENT_TOTAL.labels(decision, str(agreed).lower()).inc()
+
+    def _from_label_scores(self, results: List[Dict[str, Any]]) -> SentimentResponse:
+        """Convert classifier label scores to our format"""
+        sentiment_scores = {
+            result['label']: result['score'] 
+            for result in results
+        }
+        
+        # Determine dominant sentiment
+        dominant_sentiment = max(sentiment_scores, key=sentiment_scores.get)
+        confidence = sentiment_scores[dominant_sentiment]
+        
+        return SentimentResponse(
+            sentiment=SentimentLabel(dominant_sentiment),
+            confidence=confidence,
+            raw_scores=sentiment_scores
+        )
+
+    async def analyze_batch(self, texts: List[str], allow_partial: bool = False, lane: str = BULK) -> List[SentimentResponse]:
+        """
+        Analyze multiple texts in batch.
+
+        Large batches are scored chunk by chunk in their lane, yielding to
+        higher-priority lanes in between. With allow_partial, stops at the
+        request deadline and returns only the texts scored by then (the rest
+        are dropped from the queue).
+        """
+        if allow_partial:
+            scored, _ = await gather_until_deadline(
+                {i: self.analyze_sentiment(text, lane) for i, text in enumerate(texts)}
+            )
+            results = [scored[i] for i in sorted(scored)]
+        else:
+            results = await self.scheduler.submit(texts, lane)
+        return results
 
-    async def analyze_batch(self, texts: List[str]) -> List[SentimentResponse]:
-        """Analyze multiple texts in batch"""
-        tasks = [self.analyze_sentiment(text) for text in texts]
-        return await asyncio.gather(*tasks)
+    def index_text(self, text: str) -> str:
+        """A text as the transformer (and the embedding index) sees it"""
+        return self._preprocess_text(text)[:512]
 
     def _preprocess_text(self, text: str) -> str:
         """Preprocess text for sentiment analysis"""
@@ -0,0 +1,154 @@
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.models.schemas import AnalysisResult
+from app.services.analysis_engine import analysis_engine
+from app.utils.http_cache import ContentVersion
+from app.utils.metrics import STREAM_SUBSCRIBERS, STREAM_MESSAGES_TOTAL
+
+# Fields compared between consecutive analyses to build the pushed delta
+DELTA_FIELDS = ["overall_sentiment", "confidence_score", "recommendation", "risk_level", "source_breakdown", "partial"]
+
+
+class Subscriber:
+    """
+    One client's outbox.
+
+    Holds at most one pending message per symbol: if the client is slower than
+    the updates, newer state replaces what it hasn't read yet (marked as
+    coalesced) instead of queueing without bound.
+    """
+
+    def __init__(self):
+        self.symbols: Set[str] = set()
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def push(self, symbol: str, message: Dict[str, Any]):
+        if symbol in self._pending:
+            message = {**message, "coalesced": True}
+            STREAM_MESSAGES_TOTAL.labels("coalesced").inc()
+        self._pending[symbol] = message
+        self._pending.move_to_end(symbol)
+        self._ready.set()
+
+    async def next_messages(self) -> List[Dict[str, Any]]:
+        """Wait for and take everything pending"""
+        await self._ready.wait()
+        messages = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        return messages
+
+
+class SymbolChannel:
+    """Shared refresh loop and latest state for one symbol"""
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.subscribers: Set[Subscriber] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.etag: Optional[str] = None
+        self.latest: Optional[Dict[str, Any]] = None
+
+
+class StreamHub:
+    """Fans per-symbol analysis updates out to WebSocket subscribers"""
+
+    def __init__(self):
+        self.refresh_interval = float(os.getenv("STREAM_REFRESH_SECONDS", "60"))
+        self.days = 7
+        self.channels: Dict[str, SymbolChannel] = {}
+        analysis_engine.add_result_listener(self._on_analysis)
+
+    def subscribe(self, subscriber: Subscriber, symbols: Iterable[str]) -> List[str]:
+        added = []
+        for symbol in symbols:
+            symbol = symbol.upper()
+            if symbol in subscriber.symbols:
+                continue
+            channel = self.channels.get(symbol)
+            if channel is None:
+                channel = self.channels[symbol] = SymbolChannel(symbol)
+            channel.subscribers.add(subscriber)
+            subscriber.symbols.add(symbol)
+            STREAM_SUBSCRIBERS.inc()
+            added.append(symbol)
+
+            if channel.latest:
+                # Late joiners get the current state straight away
+                subscriber.push(symbol, {**channel.latest, "type": "snapshot", "changes": {}})
+            if channel.task is None:
+                channel.task = asyncio.create_task(self._refresh_loop(channel))
+        return added
+
+    def unsubscribe(self, subscriber: Subscriber, symbols: Optional[Iterable[str]] = None) -> List[str]:
+        removed = []
+        for symbol in list(symbols if symbols is not None else subscriber.symbols):
+            symbol = symbol.upper()
+            channel = self.channels.get(symbol)
+            if symbol not in subscriber.symbols or channel is None:
+                continue
+            subscriber.symbols.discard(symbol)
+            channel.subscribers.discard(subscriber)
+            STREAM_SUBSCRIBERS.dec()
+            removed.append(symbol)
+
+            if not channel.subscribers:
+                if channel.task:
+                    channel.task.cancel()
+                del self.channels[symbol]
+        return removed
+
+    async def _refresh_loop(self, channel: SymbolChannel):
+        """One analysis per symbol per interval, however many subscribers there are"""
+        while channel.subscribers:
+            try:
+                # Conditional on the last pushed version: unchanged articles skip inference,
+                # and fresh results reach subscribers through _on_analysis
+                await analysis_engine.analyze_symbol_conditional(
+                    channel.symbol, self.days, if_none_match=channel.etag
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stream refresh failed for {channel.symbol}: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def _on_analysis(self, symbol: str, days: int, result: AnalysisResult, version: ContentVersion):
+        """Publish a freshly scored analysis to the symbol's subscribers"""
+        channel = self.channels.get(symbol)
+        if channel is None or days != self.days or version.etag == channel.etag:
+            return
+        if result.partial and channel.latest and channel.latest["etag"] == version.etag:
+            return  # this partial version was already pushed
+
+        snapshot = result.model_dump(mode="json")
+        previous = channel.latest["analysis"] if channel.latest else {}
+        changes = {
+            field: {"from": previous.get(field), "to": snapshot[field]}
+            for field in DELTA_FIELDS
+            if previous.get(field) != snapshot[field]
+        }
+        # A deadline-truncated analysis shares the complete one's ETag; keeping the
+        # previous one makes the next refresh score (and push) the complete result
+        # instead of revalidating into the partial one
+        if not result.partial:
+            channel.etag = version.etag
+        channel.latest = {
+            "symbol": symbol,
+            "etag": version.etag,
+            "partial": result.partial,
+            "skipped_sources": result.skipped_sources,
+            "analysis": snapshot,
+        }
+
+        message = {**channel.latest, "type": "update", "changes": changes}
+        for subscriber in channel.subscribers:
+            subscriber.push(symbol, message)
+        STREAM_MESSAGES_TOTAL.labels("published").inc(len(channel.subscribers))
+
+
+stream_hub = StreamHub()
@@ -0,0 +1,208 @@
+import json
+import os
+import re
+from collections import deque
+from typing import AbstractSet, Dict, Iterable, List, Optional, Set, Tuple
+
+# Company-name aliases for commonly followed tickers; extend or override with a
+# JSON file of {"TICKER": ["Alias", ...]} at SYMBOL_ALIASES_PATH
+DEFAULT_ALIASES: Dict[str, List[str]] = {
+    "AAPL": ["Apple"],
+    "MSFT": ["Microsoft"],
+    "GOOGL": ["Alphabet", "Google"],
+    "GOOG": ["Alphabet", "Google"],
+    "AMZN": ["Amazon"],
+    "META": ["Meta Platforms", "Facebook"],
+    "NVDA": ["Nvidia"],
+    "TSLA": ["Tesla"],
+    "NFLX": ["Netflix"],
+    "AMD": ["Advanced Micro Devices"],
+    "INTC": ["Intel"],
+    "JPM": ["JPMorgan", "JP Morgan"],
+    "BAC": ["Bank of America"],
+    "WMT": ["Walmart"],
+    "DIS": ["Disney"],
+    "KO": ["Coca-Cola"],
+    "F": ["Ford Motor"],
+    "T": ["AT&T"],
+    "GM": ["General Motors"],
+    "BA": ["Boeing"],
+}
+
+# Tickers this short collide with ordinary words and initials, so they only
+# count as cashtags ($F), in parentheses ((F)) or exchange-qualified (NYSE: F)
+SHORT_TICKER_LEN = 2
+
+TICKER = "ticker"
+NAME = "name"
+
+# Candidate tickers in running text (BRK.B, BF-B), for symbols outside the automaton
+TICKER_TOKEN = re.compile(r"[A-Z][A-Z0-9]*(?:[.-][A-Z0-9]+)?")
+
+# Exchange qualifier right before a ticker ("NYSE: F", "Nasdaq:GM"); a bare
+# colon isn't enough, headlines use them constantly ("Update: T-Mobile ...")
+EXCHANGE_PREFIX = re.compile(
+    r"\b(?:NYSE(?:[ ]?(?:American|Arca|MKT))?|NYSEARCA|NYSEAMERICAN|NASDAQ(?:GS|GM|CM)?|AMEX|BATS|CBOE|"
+    r"OTC(?:QX|QB|MKTS)?|TSX|LSE)[ ]?:[ ]*$",
+    re.IGNORECASE,
+)
+EXCHANGE_PREFIX_LEN = 20
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class SymbolMatcher:
+    """
+    Multi-pattern (Aho-Corasick) matcher from tickers and company aliases to symbols.
+
+    One pass over an article finds every symbol it mentions, whatever the
+    number of symbols in the table. The table is the configured universe and
+    is compiled once; ad-hoc symbols (a request's watchlist) are checked per
+    call without touching it.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, List[str]]] = None):
+        self._aliases: Dict[str, Set[str]] = {}
+        self._dirty = True
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._out: List[List[Tuple[int, str, str, str]]] = []
+        for symbol, names in (aliases or {}).items():
+            self.add_symbol(symbol, names)
+
+    def add_symbol(self, symbol: str, aliases: Iterable[str] = ()):
+        """Register a ticker (and optional company aliases)"""
+        symbol = symbol.upper()
+        names = {alias for alias in aliases if alias}
+        known = self._aliases.get(symbol)
+        if known is None:
+            self._aliases[symbol] = names
+            self._dirty = True
+        elif names - known:
+            known.update(names)
+            self._dirty = True
+
+    def _patterns(self) -> List[Tuple[str, str, str]]:
+        """(pattern, symbol, kind) for every ticker and alias"""
+        patterns = []
+        for symbol, names in self._aliases.items():
+            patterns.append((symbol, symbol, TICKER))
+            patterns.extend((name, symbol, NAME) for name in names)
+        return patterns
+
+    def _build(self):
+        """Compile the trie and failure links over lower-cased patterns"""
+        self._goto, self._fail, self._out = [{}], [0], [[]]
+        for pattern, symbol, kind in self._patterns():
+            node = 0
+            for char in pattern.lower():
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append((len(pattern.lower()), pattern, symbol, kind))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0) if node else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+        self._dirty = False
+
+    def find(self, text: str, extra_tickers: AbstractSet[str] = frozenset()) -> Set[str]:
+        """Every symbol mentioned in the text (table symbols plus any of extra_tickers)"""
+        if self._dirty:
+            self._build()
+
+        # Lower-case per character: lower() can change length ("İ" -> "i̇"), so
+        # keep the original index of every lowered character for _accept
+        lowered: List[str] = []
+        origin: List[int] = []
+        for i, char in enumerate(text):
+            for lowered_char in char.lower():
+                lowered.append(lowered_char)
+                origin.append(i)
+
+        found: Set[str] = set()
+        node = 0
+        for end, char in enumerate(lowered):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, pattern, symbol, kind in self._out[node]:
+                if symbol not in found and self._accept(text, origin[end + 1 - length], origin[end] + 1, pattern, kind):
+                    found.add(symbol)
+
+        if extra_tickers:
+            for match in TICKER_TOKEN.finditer(text):
+                ticker = match.group()
+                if ticker in extra_tickers and ticker not in found and \
+                        self._accept(text, match.start(), match.end(), ticker, TICKER):
+                    found.add(ticker)
+        return found
+
+    def _accept(self, text: str, start: int, end: int, pattern: str, kind: str) -> bool:
+        """Apply word-boundary and case rules to a candidate match"""
+        if start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_word_char(text[end]):
+            return False
+        if kind == NAME:
+            return True
+
+        # Tickers are case-sensitive
+        if text[start:end] != pattern:
+            return False
+        if len(pattern) > SHORT_TICKER_LEN:
+            return True
+
+        before = text[start - 1] if start > 0 else ""
+        after = text[end] if end < len(text) else ""
+        if before == "$" or (before == "(" and after == ")"):
+            return True
+
+        # Exchange-qualified, e.g. "NYSE: F"
+        return EXCHANGE_PREFIX.search(text, max(0, start - EXCHANGE_PREFIX_LEN), start) is not None
+
+    def route(self, entries: Iterable[Dict], watchlist: Iterable[str]) -> Dict[str, List[Dict]]:
+        """Bucket feed entries by the watchlist symbols their title/summary mention"""
+        watched = {symbol.upper() for symbol in watchlist}
+        # Symbols outside the configured universe come from user input; match
+        # them as bare tickers rather than growing and recompiling the table
+        extra = {symbol for symbol in watched if symbol not in self._aliases}
+
+        routed: Dict[str, List[Dict]] = {symbol: [] for symbol in watched}
+        for entry in entries:
+            text = f"{entry.get('title', '')}\n{entry.get('summary', '')}"
+            for symbol in self.find(text, extra) & watched:
+                routed[symbol].append(entry)
+        return routed
+
+
+def _load_aliases() -> Dict[str, List[str]]:
+    aliases = {symbol: list(names) for symbol, names in DEFAULT_ALIASES.items()}
+    path = os.getenv("SYMBOL_ALIASES_PATH")
+    if path:
+        try:
+            with open(path) as f:
+                for symbol, names in json.load(f).items():
+                    aliases[symbol.upper()] = list(names)
+        except Exception as e:
+            print(f"Error loading symbol aliases from {path}: {e}")
+    return aliases
+
+
+# Global instance
+symbol_matcher = SymbolMatcher(_load_aliases())
@@ -0,0 +1,130 @@
+import html
+import os
+import re
+from typing import Dict, List, Optional
+
+import lxml.html
+from bs4 import BeautifulSoup
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import NORMALIZER_TOKENS_TOTAL
+
+# Feed furniture that carries no sentiment: syndication footers, "read more"
+# links, truncation markers and bare (usually tracking) URLs
+BOILERPLATE_PATTERNS = [
+    re.compile(r"The post .{1,300}? appeared first on .{1,100}?(\.|$)", re.IGNORECASE),
+    # Only a "read more" link that starts a line or sentence and is all that is
+    # left of it ("... Continue reading on Reuters »"), never the words mid-sentence
+    re.compile(
+        r"(?:^|(?<=[.!?…\]]))[ \t]*"
+        r"(?:Continue reading|Read more|Read the full (?:story|article)|Click here(?: to read (?:more|the full (?:story|article)))?)"
+        r"(?:[ \t]+(?:at|on|from|here)\b[^.!?\n]{0,60})?"
+        r"[ \t.…:»›→>\-–—]*(?:\(?https?://\S+\)?)?[ \t.…»›→>]*$",
+        re.IGNORECASE | re.MULTILINE,
+    ),
+    # The syndication note is one sentence; stop at its end (or the line's) so
+    # text that follows it in the summary survives
+    re.compile(
+        r"(?:^|(?<=[.!?…\]]))[ \t]*(?:This article|This story) was originally published\b[^\n]*?(?:[.!?](?=\s|$)|$)",
+        re.IGNORECASE | re.MULTILINE,
+    ),
+    re.compile(r"\[(…|\.\.\.|&hellip;)\]|\[\+\d+ chars\]"),
+    re.compile(r"https?://\S+"),
+]
+WHITESPACE = re.compile(r"\s+")
+SPACE_BEFORE_PUNCTUATION = re.compile(r"\s+([.,;:!?)])")
+# Rough word-piece count: words and standalone punctuation, close to what a
+# BERT tokenizer produces for English news text
+TOKEN = re.compile(r"\w+|[^\w\s]")
+
+DROPPED_TAGS = ("script", "style", "noscript", "iframe", "img", "figure")
+
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN.findall(text))
+
+
+class TextNormalizer:
+    """
+    Turns raw feed summaries into plain text before inference.
+
+    Strips markup with lxml, decodes entities, drops boilerplate and a leading
+    copy of the headline, so the model only sees the words that matter.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("TEXT_NORMALIZATION", "true").lower() == "true"
+        # The same feed items come back on every refresh; only new ones get parsed
+        self.cache = TTLCache("normalized_text", ttl=3600, maxsize=4096, priority=0)
+
+    def normalize(self, text: str, title: Optional[str] = None) -> str:
+        """Plain-text version of one article body"""
+        if not text:
+            return title or ""
+
+        key = (title, text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        clean = self._strip_markup(text) if "<" in text else text
+        clean = html.unescape(clean)
+        for pattern in BOILERPLATE_PATTERNS:
+            clean = pattern.sub(" ", clean)
+        clean = WHITESPACE.sub(" ", clean).strip()
+        clean = SPACE_BEFORE_PUNCTUATION.sub(r"\1", clean)
+        clean = self._drop_title(clean, title) or title or ""
+
+        self.cache.set(key, clean)
+        return clean
+
+    def normalize_batch(self, articles: List[Dict[str, str]], field: str = "content") -> List[str]:
+        """Normalize the `field` of each article, recording raw vs. normalized token counts"""
+        if not self.enabled:
+            return [article.get(field) or "" for article in articles]
+
+        raw_tokens = normalized_tokens = 0
+        texts = []
+        for article in articles:
+            raw = article.get(field) or ""
+            clean = self.normalize(raw, article.get("title"))
+            raw_tokens += count_tokens(raw)
+            normalized_tokens += count_tokens(clean)
+            texts.append(clean)
+
+        NORMALIZER_TOKENS_TOTAL.labels("raw").inc(raw_tokens)
+        NORMALIZER_TOKENS_TOTAL.labels("normalized").inc(normalized_tokens)
+        return texts
+
+    def _strip_markup(self, text: str) -> str:
+        try:
+            root = lxml.html.fragment_fromstring(text, create_parent="div")
+            for element in list(root.iter(*DROPPED_TAGS)):
+                element.drop_tree()
+            # Join text nodes with spaces so adjacent blocks don't run together
+            return " ".join(root.itertext())
+        except Exception:
+            # lxml gives up on some fragments (e.g. markup with no text); bs4 copes
+            return BeautifulSoup(text, "html.parser").get_text(" ")
+
+    @staticmethod
+    def _drop_title(text: str, title: Optional[str]) -> str:
+        """Remove a leading repeat of the headline (Google News summaries are mostly that)"""
+        if not title:
+            return text
+        title = WHITESPACE.sub(" ", html.unescape(title)).strip()
+        if not title or not text.lower().startswith(title.lower()):
+            return text
+        rest = text[len(title):]
+        # Only a standalone repeat ("Headline - body", "Headline. Body"), not a
+        # body whose first sentence happens to start with the headline words
+        separator = rest.lstrip(" ")[:1]
+        if not separator or separator not in "-–—:|.":
+            return text
+        rest = rest.lstrip(" -–—:|.")
+        # Keep the headline when it is all there is to score
+        return rest if count_tokens(rest) >= 3 else text
+
+
+# Global instance
+text_normalizer = TextNormalizer()
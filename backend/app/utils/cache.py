@@ -0,0 +1,91 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+from app.utils.metrics import CACHE_REQUESTS_TOTAL
+
+# Every cache in the process, for the memory manager to size and shrink
+CACHES: List["TTLCache"] = []
+
+
+def approx_size(value: Any, depth: int = 0) -> int:
+    """Rough deep size in bytes of a cached value (containers and models walked a few levels)"""
+    size = sys.getsizeof(value)
+    if depth >= 4 or isinstance(value, (str, bytes)):
+        return size
+    if isinstance(value, dict):
+        return size + sum(approx_size(k, depth + 1) + approx_size(v, depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(approx_size(item, depth + 1) for item in value)
+    if hasattr(value, "__dict__"):
+        return size + approx_size(vars(value), depth + 1)
+    return size
+
+
+class TTLCache:
+    """
+    Small in-process cache with per-entry expiry and LRU eviction.
+
+    Tracks the approximate bytes it holds; `priority` orders eviction under
+    memory pressure (lowest goes first). Caches holding state rather than
+    rebuildable data pass `shrinkable=False` and keep their size.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 256, priority: int = 1, shrinkable: bool = True):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.limit = maxsize
+        self.priority = priority
+        self.shrinkable = shrinkable
+        self.bytes = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        CACHES.append(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            CACHE_REQUESTS_TOTAL.labels(self.name, "miss").inc()
+            return None
+
+        self._entries.move_to_end(key)
+        CACHE_REQUESTS_TOTAL.labels(self.name, "hit").inc()
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl <= 0 or self.limit <= 0:
+            return
+        if key in self._entries:
+            self._remove(key)
+        size = approx_size(key) + approx_size(value)
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.bytes += size
+        self._trim(self.limit)
+
+    def resize(self, limit: int):
+        """Change how many entries the cache may hold, evicting least recently used ones"""
+        self.limit = max(0, limit)
+        self._trim(self.limit)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if entry[0] < now]:
+            self._remove(key)
+
+    def _trim(self, limit: int):
+        while len(self._entries) > limit:
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry[2]
+
+    def _remove(self, key: Hashable):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
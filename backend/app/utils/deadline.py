@@ -0,0 +1,78 @@
+import asyncio
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+# Clients can shorten (never extend) the server's time budget per request
+DEADLINE_HEADER = "x-deadline-ms"
+DEADLINE_PARAM = "deadline_ms"
+DEFAULT_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "15000"))
+
+
+class Deadline:
+    """Time budget for one request, plus the work that was dropped to meet it"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.skipped: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def skip(self, name: str):
+        if name not in self.skipped:
+            self.skipped.append(name)
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def start_deadline(requested_ms: Optional[str] = None) -> Optional[Deadline]:
+    """Begin the current request's deadline (server default, or the client's if shorter)"""
+    budget_ms = DEFAULT_DEADLINE_MS
+    try:
+        requested = float(requested_ms) if requested_ms else None
+    except ValueError:
+        requested = None
+    # Only a positive, finite client value counts, and it can only shorten the budget
+    # (0 or a negative value must not switch the server's deadline off)
+    if requested is not None and requested > 0 and math.isfinite(requested):
+        budget_ms = min(budget_ms, requested) if budget_ms > 0 else requested
+    deadline = Deadline(budget_ms / 1000) if budget_ms > 0 else None
+    _deadline.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline.get()
+
+
+async def gather_until_deadline(awaitables: Dict[Any, Awaitable]) -> Tuple[Dict[Any, Any], List[Any]]:
+    """
+    Run named awaitables concurrently until the current deadline.
+
+    Returns (results of those that finished, names of those cut off); the
+    unfinished ones are cancelled so no work continues for a gone request.
+    Without a deadline this simply waits for everything.
+    """
+    if not awaitables:
+        return {}, []
+    deadline = current_deadline()
+    tasks = {asyncio.ensure_future(awaitable): name for name, awaitable in awaitables.items()}
+    done, pending = await asyncio.wait(tasks, timeout=deadline.remaining() if deadline else None)
+
+    for task in pending:
+        task.cancel()
+    results = {}
+    for task in done:
+        if task.exception() is not None:
+            print(f"{tasks[task]} failed: {task.exception()}")
+        else:
+            results[tasks[task]] = task.result()
+    return results, [name for task, name in tasks.items() if task in pending]
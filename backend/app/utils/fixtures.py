@@ -0,0 +1,36 @@
+import os
+from typing import Optional
+
+# Placeholder substituted with the requested key when a provider's
+# _default fixture is used (lets one payload stand in for any symbol)
+KEY_PLACEHOLDER = "{{symbol}}"
+DEFAULT_FIXTURE = "_default"
+
+
+def fixture_path(fixtures_dir: str, provider: str, key: str, ext: str) -> str:
+    """Path of a recorded upstream payload"""
+    safe_key = "".join(c if c.isalnum() or c in "-_." else "_" for c in key)
+    return os.path.join(fixtures_dir, provider, f"{safe_key}.{ext}")
+
+
+def load_fixture(fixtures_dir: str, provider: str, key: str, ext: str) -> Optional[str]:
+    """Load a recorded payload, falling back to the provider's _default fixture"""
+    path = fixture_path(fixtures_dir, provider, key, ext)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    default_path = fixture_path(fixtures_dir, provider, DEFAULT_FIXTURE, ext)
+    if os.path.exists(default_path):
+        with open(default_path, encoding="utf-8") as f:
+            return f.read().replace(KEY_PLACEHOLDER, key)
+
+    return None
+
+
+def save_fixture(fixtures_dir: str, provider: str, key: str, ext: str, payload: str):
+    """Record an upstream payload for later replay"""
+    path = fixture_path(fixtures_dir, provider, key, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(payload)
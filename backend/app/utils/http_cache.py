@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.utils.cache import TTLCache
+
+# Cache-Control max-age hint for polled endpoints; keep it in line with FEED_CACHE_TTL
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+
+class ContentVersion(NamedTuple):
+    etag: str
+    last_modified: datetime
+
+
+# First time each content version was seen, used as its Last-Modified; evicting
+# one would move Last-Modified forward, so memory pressure leaves it alone
+_first_seen = TTLCache("content_versions", ttl=24 * 3600, maxsize=4096, shrinkable=False)
+
+
+def content_version(*parts: Any) -> ContentVersion:
+    """Stable version for a response derived from the content it is built from"""
+    digest = hashlib.sha1(
+        json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    etag = f'W/"{digest[:20]}"'
+
+    last_modified = _first_seen.get(etag)
+    if last_modified is None:
+        last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        _first_seen.set(etag, last_modified)
+    return ContentVersion(etag, last_modified)
+
+
+def is_not_modified(version: ContentVersion, if_none_match: Optional[str],
+                    if_modified_since: Optional[str] = None) -> bool:
+    """Evaluate conditional request headers against a content version"""
+    if if_none_match:
+        # If-None-Match takes precedence; compare weakly as RFC 9110 requires
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        bare = version.etag.removeprefix("W/")
+        return "*" in candidates or any(tag.removeprefix("W/") == bare for tag in candidates)
+
+    if if_modified_since:
+        try:
+            return version.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def cache_headers(version: ContentVersion, max_age: int = HTTP_CACHE_MAX_AGE) -> Dict[str, str]:
+    """Validator and freshness headers for a versioned response"""
+    return {
+        "ETag": version.etag,
+        "Last-Modified": format_datetime(version.last_modified, usegmt=True),
+        "Cache-Control": f"max-age={max_age}, must-revalidate",
+    }
@@ -0,0 +1,91 @@
+import os
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# Latency buckets (seconds) shared by the pipeline stage histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# HTTP layer
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+IN_FLIGHT_REQUESTS = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", multiprocess_mode="livesum"
+)
+
+# Data collection
+PROVIDER_FETCH_SECONDS = Histogram(
+    "provider_fetch_duration_seconds", "Upstream provider fetch latency",
+    ["provider", "outcome"], buckets=LATENCY_BUCKETS
+)
+FEED_PARSE_SECONDS = Histogram(
+    "feed_parse_duration_seconds", "RSS/Atom feed parse time",
+    ["provider"], buckets=LATENCY_BUCKETS
+)
+MOCK_FALLBACK_TOTAL = Counter("news_mock_fallback_total", "Times news collection fell back to mock data", ["reason"])
+QUOTA_REQUESTS_TOTAL = Counter(
+    "provider_quota_requests_total", "Quota-scheduled provider calls: granted, denied (budget) or throttled (429)",
+    ["provider", "result"]
+)
+CACHE_REQUESTS_TOTAL = Counter("cache_requests_total", "Cache lookups", ["cache", "result"])
+
+NORMALIZER_TOKENS_TOTAL = Counter(
+    "normalizer_tokens_total", "Approximate tokens in article text before (raw) and after (normalized) cleanup", ["stage"]
+)
+
+# Inference
+INFERENCE_BATCH_SECONDS = Histogram(
+    "inference_batch_duration_seconds", "Sentiment inference time per scored chunk (excludes queueing)",
+    ["backend"], buckets=LATENCY_BUCKETS
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    "inference_batch_size", "Texts per inference batch",
+    ["backend"], buckets=BATCH_SIZE_BUCKETS
+)
+INFERENCE_TEXTS_TOTAL = Counter("inference_texts_total", "Texts scored, by backend", ["backend"])
+CASCADE_DECISIONS_TOTAL = Counter(
+    "cascade_decisions_total", "Cascade routing: settled by the lexicon or escalated to the transformer", ["decision"]
+)
+CASCADE_AGREEMENT_TOTAL = Counter(
+    "cascade_agreement_total", "Lexicon/transformer label agreement on texts both scored", ["decision", "agreed"]
+)
+INFERENCE_QUEUE_DEPTH = Gauge(
+    "inference_queue_depth", "Texts waiting for an inference slot", multiprocess_mode="livesum"
+)
+INFERENCE_QUEUE_WAIT_SECONDS = Histogram(
+    "inference_queue_wait_seconds", "Time from submission to first scored chunk, by priority lane",
+    ["lane"], buckets=LATENCY_BUCKETS
+)
+
+# Analysis pipeline
+ANALYSIS_STAGE_SECONDS = Histogram(
+    "analysis_stage_duration_seconds", "AnalysisEngine.analyze_symbol stage latency",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+
+# Memory
+CACHE_SIZE_BYTES = Gauge("cache_size_bytes", "Approximate bytes held per cache", ["cache"], multiprocess_mode="livesum")
+MEMORY_ACTIONS_TOTAL = Counter(
+    "memory_actions_total", "Memory manager interventions (cache shrink/grow, model unload/reload)", ["action"]
+)
+
+# Live updates
+STREAM_SUBSCRIBERS = Gauge(
+    "stream_subscriptions", "Active WebSocket symbol subscriptions", multiprocess_mode="livesum"
+)
+STREAM_MESSAGES_TOTAL = Counter(
+    "stream_messages_total", "WebSocket update messages, published or coalesced for slow consumers", ["result"]
+)
+
+
+def render_metrics():
+    """Current metrics in Prometheus text exposition format"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Multi-worker serving (gunicorn.conf.py): aggregate every worker's samples
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,54 @@
+import os
+import time
+import uuid
+from typing import Optional
+
+# Opt-in per-request profiling: needs PROFILING_ENABLED=true on the server and an
+# X-Profile header on the request (matching PROFILING_TOKEN when one is set)
+PROFILE_HEADER = "x-profile"
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.enabled = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+        self.token = os.getenv("PROFILING_TOKEN")
+        self.profile_dir = os.getenv("PROFILE_DIR", "profiles")
+        self.interval = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+
+    def wants_profile(self, header_value: Optional[str]) -> bool:
+        """Whether a request carrying this X-Profile header should be profiled"""
+        if not self.enabled or not header_value:
+            return False
+        if self.token:
+            return header_value == self.token
+        return header_value.lower() not in ("0", "false")
+
+    def start(self):
+        """Start sampling the current request; returns None if pyinstrument is unavailable"""
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("Profiling requested but pyinstrument is not installed")
+            return None
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    def save(self, profiler, label: str) -> str:
+        """Stop the profiler and store a speedscope (flame graph) profile; returns its id"""
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        profiler.stop()
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with open(self.profile_path(profile_id), "w") as f:
+            f.write(profiler.output(renderer=SpeedscopeRenderer()))
+        print(f"Stored profile {profile_id} for {label}")
+        return profile_id
+
+    def profile_path(self, profile_id: str) -> str:
+        return os.path.join(self.profile_dir, f"{profile_id}.speedscope.json")
+
+
+request_profiler = RequestProfiler()
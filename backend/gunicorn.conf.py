@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for multi-worker serving.
+
+The app (and with it the FinBERT model) is imported once in the master
+process before workers are forked, so every worker shares the model weights
+copy-on-write instead of loading its own ~1.5 GB copy. Torch threads are
+then partitioned across workers so they don't oversubscribe the cores.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+import gc
+import os
+import shutil
+import tempfile
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Load the app (and model) in the master before forking
+preload_app = True
+
+# Metrics from all workers are aggregated through a shared directory; it must be
+# set before prometheus_client is imported by the app
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "finance-sentiment-metrics")
+)
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+# Keep the master single-threaded while it loads the model: an intra-op thread
+# pool started before fork is not usable in the children
+try:
+    import torch
+    torch.set_num_threads(1)
+except ImportError:
+    pass
+
+
+def _threads_per_worker() -> int:
+    configured = os.getenv("TORCH_THREADS_PER_WORKER")
+    if configured:
+        return int(configured)
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def when_ready(server):
+    # Move everything loaded so far (model included) out of the GC's view so
+    # collections in the workers don't touch, and un-share, those pages
+    gc.freeze()
+    server.log.info(f"Model preloaded in master, forking {workers} workers")
+
+
+def post_fork(server, worker):
+    from app.services.sentiment_analyzer import sentiment_analyzer
+
+    threads = _threads_per_worker()
+    sentiment_analyzer.configure_threads(threads)
+    server.log.info(f"Worker {worker.pid}: {sentiment_analyzer.backend} scorer, {threads} torch threads")
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1 @@
+# Offline load-test tooling
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Load-generation harness for the Finance Sentiment API.
+
+Drives each endpoint scenario at a target concurrency and reports RPS,
+p50/p95/p99 latency and event-loop lag. By default the FastAPI app runs
+in-process with DataCollector replaying recorded fixtures, so no network
+access is needed:
+
+    python -m loadtest.harness --scenario analysis --scenario news --concurrency 20 --duration 15
+
+Other modes:
+    --upstream http://127.0.0.1:8900   in-process app, upstreams served by loadtest.stub_upstream
+    --base-url http://127.0.0.1:8000   drive an already running server (lag is then the harness's own loop)
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+DEFAULT_FIXTURES = str(Path(__file__).resolve().parent / "fixtures")
+
+# name -> (method, path template, JSON body)
+SCENARIOS = {
+    "analysis": ("GET", "/api/analysis/symbol/{symbol}", None),
+    "advice": ("GET", "/api/analysis/advice/{symbol}", None),
+    "news": ("GET", "/api/data/news/{symbol}", None),
+    "blogs": ("GET", "/api/data/blogs/{symbol}", None),
+    "sentiment": ("POST", "/api/sentiment/analyze",
+                  {"text": "{symbol} shares rise after earnings beat estimates on strong growth"}),
+}
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01):
+    """Sample how late the event loop wakes up from a fixed sleep"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+def _render(value: Any, symbol: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{symbol}", symbol)
+    if isinstance(value, dict):
+        return {k: _render(v, symbol) for k, v in value.items()}
+    return value
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, symbols: List[str],
+                       concurrency: int, duration: float, warmup: float = 0) -> Dict[str, Any]:
+    """Run one scenario at fixed concurrency and summarise the results"""
+    method, path, body = SCENARIOS[name]
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lag_samples: List[float] = []
+    counter = 0
+
+    async def worker(deadline: float, record: bool):
+        nonlocal counter
+        while time.perf_counter() < deadline:
+            symbol = symbols[counter % len(symbols)]
+            counter += 1
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, _render(path, symbol), json=_render(body, symbol))
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            if record:
+                latencies.append(time.perf_counter() - start)
+                statuses[status] += 1
+
+    if warmup > 0:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(deadline, False) for _ in range(concurrency)))
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples, stop))
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(deadline, True) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    lat_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    lag_ms = np.array(lag_samples) * 1000 if lag_samples else np.zeros(1)
+    errors = sum(n for status, n in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "scenario": name,
+        "method": method,
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(statuses),
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": float(np.percentile(lat_ms, 50)),
+            "p95": float(np.percentile(lat_ms, 95)),
+            "p99": float(np.percentile(lat_ms, 99)),
+            "max": float(lat_ms.max()),
+        },
+        "loop_lag_ms": {
+            "p50": float(np.percentile(lag_ms, 50)),
+            "p99": float(np.percentile(lag_ms, 99)),
+            "max": float(lag_ms.max()),
+        },
+    }
+
+
+def print_report(results: List[Dict[str, Any]], lag_label: str):
+    header = f"{'scenario':<10} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {lag_label:>14}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat = r["latency_ms"]
+        lag = r["loop_lag_ms"]
+        print(f"{r['scenario']:<10} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f} "
+              f"{lag['p99']:>6.1f}/{lag['max']:<7.1f}")
+
+
+def build_client(base_url: Optional[str]) -> httpx.AsyncClient:
+    """HTTP client for a remote server, or an ASGI client for the in-process app"""
+    timeout = httpx.Timeout(120.0)
+    if base_url:
+        return httpx.AsyncClient(base_url=base_url, timeout=timeout)
+
+    # DataCollector reads its settings at import time, so configure first
+    from app.main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=timeout)
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    results = []
+    async with build_client(args.base_url) as client:
+        for name in args.scenario or ["analysis"]:
+            print(f"Running '{name}' at concurrency {args.concurrency} for {args.duration}s...")
+            results.append(await run_scenario(
+                client, name, args.symbols.split(","), args.concurrency, args.duration, args.warmup
+            ))
+
+    if not args.base_url:
+        from app.services.data_collector import data_collector
+        await data_collector.close_session()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the Finance Sentiment API")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: analysis)")
+    parser.add_argument("--symbols", default="AAPL,TSLA,MSFT,NVDA", help="Comma-separated symbols to cycle through")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--base-url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--upstream", help="Stub upstream URL for the in-process app (instead of fixture replay)")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Fixtures replayed by the in-process app")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        if args.upstream:
+            os.environ["UPSTREAM_OVERRIDE_URL"] = args.upstream
+        else:
+            os.environ.setdefault("DATA_REPLAY_DIR", args.fixtures)
+
+    results = asyncio.run(run(args))
+
+    print()
+    print_report(results, "lag p99/max" if not args.base_url else "harness lag")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
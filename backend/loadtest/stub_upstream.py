@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the upstream news providers.
+
+Serves recorded payloads from a fixtures directory at /{provider}/{symbol},
+with configurable latency and error injection. Point the backend at it with:
+
+    UPSTREAM_OVERRIDE_URL=http://127.0.0.1:8900 uvicorn app.main:app
+
+Run from the backend directory:
+
+    python -m loadtest.stub_upstream --latency-ms 80 --jitter-ms 40 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from pathlib import Path
+
+from aiohttp import web
+
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from app.utils.fixtures import load_fixture
+
+DEFAULT_FIXTURES = str(Path(__file__).resolve().parent / "fixtures")
+
+CONTENT_TYPES = {
+    "xml": "application/rss+xml",
+    "json": "application/json",
+}
+
+
+def create_app(fixtures_dir: str, latency_ms: float = 0, jitter_ms: float = 0,
+               error_rate: float = 0, error_status: int = 503, timeout_rate: float = 0,
+               hang_seconds: float = 60) -> web.Application:
+    """Build the stub upstream application"""
+    stats = {"requests": 0, "errors": 0, "timeouts": 0, "not_found": 0}
+
+    async def serve_payload(request: web.Request) -> web.Response:
+        provider = request.match_info["provider"]
+        key = request.match_info["key"]
+        stats["requests"] += 1
+
+        delay = max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+
+        roll = random.random()
+        if roll < timeout_rate:
+            stats["timeouts"] += 1
+            await asyncio.sleep(hang_seconds)
+        elif roll < timeout_rate + error_rate:
+            stats["errors"] += 1
+            return web.Response(status=error_status, text="injected upstream error")
+
+        for ext in ("xml", "json"):
+            payload = load_fixture(fixtures_dir, provider, key, ext)
+            if payload is not None:
+                return web.Response(text=payload, content_type=CONTENT_TYPES[ext])
+
+        stats["not_found"] += 1
+        return web.Response(status=404, text=f"no fixture for {provider}/{key}")
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/_stats", get_stats)
+    app.router.add_get("/{provider}/{key}", serve_payload)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub upstream server for offline load tests")
+    parser.add_argument("--fixtures", default=os.getenv("DATA_REPLAY_DIR", DEFAULT_FIXTURES),
+                        help="Directory of recorded payloads ({provider}/{symbol}.xml|json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Base response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Uniform +/- latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--timeout-rate", type=float, default=0, help="Fraction of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=60, help="How long hanging requests stall")
+    args = parser.parse_args()
+
+    print(f"Serving fixtures from {args.fixtures} on http://{args.host}:{args.port}")
+    web.run_app(
+        create_app(args.fixtures, args.latency_ms, args.jitter_ms, args.error_rate,
+                   args.error_status, args.timeout_rate, args.hang_seconds),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
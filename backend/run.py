@@ -33,6 +33,11 @@ if __name__ == "__main__":
     # Get port from environment or use default
     port = int(os.environ.get("PORT", 8000))
     
+    # Multiple workers: hand over to gunicorn so the model is loaded once
+    # before forking and shared between workers (see gunicorn.conf.py)
+    if int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+        os.execvp("gunicorn", ["gunicorn", "-c", str(backend_dir / "gunicorn.conf.py"), "app.main:app"])
+    
     # Run the app
     uvicorn.run(
         "app.main:app",
@@ -22,4 +22,8 @@ ls -la app/models/
 echo "=============================="
 
 # Port is provided by Render as $PORT environment variable
+# With WEB_CONCURRENCY > 1, gunicorn preloads the model once and forks workers that share it
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+    exec gunicorn -c gunicorn.conf.py app.main:app
+fi
 uvicorn app.main:app --host 0.0.0.0 --port ${PORT:-8000}